@@ -15,6 +15,24 @@ message_config = {
    "message_webhook_id": <YOUR_DISCORD_WEBHOOK_ID>,
    "message_webhook_token": <YOUR_DISCORD_WEBHOOK_TOKEN>
 }
+# dYdX node and indexer endpoints. Calls go to the fastest healthy endpoint,
+# reads are hedged to a second one and broadcasts fail over between nodes.
+# For mainnet, e.g.:
+#   "network": "mainnet",
+#   "nodes": [<YOUR_MAINNET_NODE>, <YOUR_SECOND_MAINNET_NODE>],
+#   "indexers": ["https://indexer.dydx.trade"],
+#   "websocket": "wss://indexer.dydx.trade/v4/ws"
+dydx_endpoints = {
+    "network": "testnet",
+    "nodes": ["test-dydx-grpc.kingnodes.com"],
+    "indexers": ["https://indexer.v4testnet.dydx.exchange"],
+    "websocket": "wss://indexer.v4testnet.dydx.exchange/v4/ws"
+}
+# Split large orders of a strategy (the signal's order_strategy, "*" for any
+# other) into child orders, e.g.:
+#   "breakout": {"algo": "twap", "slices": 5, "blocks": 10}
+#   "swing": {"algo": "block_cap", "max_size": 0.5}
+slicing_policies = {}
 # Parameter format
 props = {
     "SECRET_NAME": <YOUR_SECRET_NAME>,
@@ -26,6 +44,9 @@ props = {
     "WEBHOOK_IP_ALLOWED_LIST": webhook_ip_allowed_list,
     "MESSAGE_NAME": "discord_notification",
     "MESSAGE_CONFIG": message_config,
+    "ENDPOINTS_SSM_NAME": "dydx_endpoints",
+    "DYDX_ENDPOINTS": dydx_endpoints,
+    "SLICING_POLICIES": slicing_policies,
     "namespace": namespace,
     "function_name": f"{namespace}-TradingBotLambda",
     "custom_auth_function_name": f"{namespace}-CustomAuth",
@@ -1,3 +1,5 @@
+import json
+
 from aws_cdk import (
     aws_iam,
     aws_lambda,
@@ -27,14 +29,19 @@ class AutoTradingBotRestApiStack(Stack):
             "Sid": "RetrieveSSMParameterPolicy",
             "Effect": "Allow",
             "Action": ["ssm:GetParameter"],
-            "Resource": f"arn:aws:ssm:{Aws.REGION}:{Aws.ACCOUNT_ID}:parameter/{props["MESSAGE_NAME"]}*"
+            "Resource": [
+                f"arn:aws:ssm:{Aws.REGION}:{Aws.ACCOUNT_ID}:parameter/{props["MESSAGE_NAME"]}*",
+                f"arn:aws:ssm:{Aws.REGION}:{Aws.ACCOUNT_ID}:parameter/{props["ENDPOINTS_SSM_NAME"]}*"
+            ]
         }
         bot_lambda_role.add_to_principal_policy(aws_iam.PolicyStatement.from_json(secret_policy_statement))
         bot_lambda_role.add_to_principal_policy(aws_iam.PolicyStatement.from_json(ssm_policy_statement))
 
         bot_lambda_function.add_environment("SECRET_NAME", props["SECRET_NAME"])
         bot_lambda_function.add_environment("MESSAGE_NAME", props["MESSAGE_NAME"])
+        bot_lambda_function.add_environment("ENDPOINTS_SSM_NAME", props["ENDPOINTS_SSM_NAME"])
         bot_lambda_function.add_environment("REGION_NAME", props["REGION_NAME"])
+        bot_lambda_function.add_environment("SLICING_POLICIES", json.dumps(props["SLICING_POLICIES"]))
 
         custom_auth_lambda = aws_lambda.Function(self, "CustomAuth",
             function_name=props["custom_auth_function_name"],
@@ -29,6 +29,13 @@ class AutoTradingBotEcrStack(Stack):
             string_value=json.dumps(props["MESSAGE_CONFIG"]),
             description="Token and ID to send message"
         )
+        # SSM parameter to get dYdX node and indexer endpoints
+        endpoints_params = aws_ssm.StringParameter(
+            self, "EndpointsParameter",
+            parameter_name=props["ENDPOINTS_SSM_NAME"],
+            string_value=json.dumps(props["DYDX_ENDPOINTS"]),
+            description="dYdX node and indexer endpoints"
+        )
 
         # Pipeline requires versioned bucket
         bot_bucket = aws_s3.Bucket(
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# Replay recorded TradingView webhook payloads against a simulated exchange.
+#
+# Signals are parsed by the handler's own validation and gated by the live
+# risk settings (FREE_COLLATERAL_MIN, MAX_SLIPPAGE_BPS). Every strategy trades its
+# own simulated account; fills are priced from memory-mapped per-market price
+# series and positions, fees, PnL and drawdown are computed with NumPy.
+#
+#   python backtest/replay.py prices --market BTC-USD --csv btc.csv --out prices/
+#   python backtest/replay.py run --signals webhooks.jsonl --prices prices/ --workers 4
+#   python backtest/replay.py synth --signals 2000000 --out /tmp/replay   # sample data
+#
+# The signal log holds one webhook body per line: a signal object or a batch array.
+# A price file is <prices>/<market pair>.npy with int64 "time" (epoch seconds,
+# ascending) and float64 "price" fields.
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "docker-build")
+sys.path.insert(0, BOT_DIR)
+
+from risk import FREE_COLLATERAL_MIN, MAX_SLIPPAGE_BPS  # noqa: E402
+from signal_core import validate_signal  # noqa: E402
+
+PRICE_DTYPE = np.dtype([("time", "<i8"), ("price", "<f8")])
+BUY = 1
+SELL = -1
+
+# Price series opened in this process, by market pair
+price_files = {}
+
+
+def write_prices(path, times, prices):
+    series = np.empty(len(times), dtype=PRICE_DTYPE)
+    series["time"] = times
+    series["price"] = prices
+    series.sort(order="time")
+    np.save(path, series)
+
+
+def load_prices(prices_dir, market_pair):
+    series = price_files.get((prices_dir, market_pair))
+    if series is None:
+        path = os.path.join(prices_dir, f"{market_pair}.npy")
+        series = np.load(path, mmap_mode="r") if os.path.exists(path) else np.empty(0, dtype=PRICE_DTYPE)
+        price_files[(prices_dir, market_pair)] = series
+    return series
+
+
+def parse_times(values):
+    try:
+        return np.array([value.rstrip("Z") for value in values], dtype="datetime64[s]").astype(np.int64)
+    except ValueError:
+        times = np.empty(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            try:
+                times[i] = np.datetime64(value.rstrip("Z"), "s").astype(np.int64)
+            except ValueError:
+                times[i] = -1
+        return times
+
+
+# Parse the log lines starting in [start, end) into columns
+def parse_chunk(path, start, end):
+    strategies, markets, times, sides, sizes = [], [], [], [], []
+    invalid = 0
+    with open(path, "rb") as f:
+        if start:
+            # A line starting exactly at start belongs to this chunk
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            if not line.strip():
+                continue
+            try:
+                body = json.loads(line)
+            except ValueError:
+                invalid += 1
+                continue
+            for data in body if isinstance(body, list) else (body,):
+                signal, error = validate_signal(data)
+                if error is not None or not isinstance(signal["signal_time"], str):
+                    invalid += 1
+                    continue
+                strategies.append(str(signal["order_strategy"]))
+                markets.append(signal["market_pair"])
+                times.append(signal["signal_time"])
+                sides.append(BUY if signal["order_side"] == "buy" else SELL)
+                sizes.append(signal["order_size"])
+    parsed_times = parse_times(times)
+    timed = parsed_times >= 0
+    return {
+        "strategy": np.array(strategies, dtype=object)[timed],
+        "market": np.array(markets, dtype=object)[timed],
+        "time": parsed_times[timed],
+        "side": np.array(sides, dtype=np.int8)[timed],
+        "size": np.array(sizes, dtype=np.float64)[timed],
+        "invalid": invalid + int((~timed).sum())
+    }
+
+
+def chunk_bounds(path, chunks):
+    size = os.path.getsize(path)
+    step = max(1, -(-size // chunks))
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+# Free collateral before each signal given which signals were accepted
+def account_path(accepted, side, size, fill, market, marks, collateral, imf, fee_rate):
+    n, m = marks.shape
+    rows = np.arange(n)
+    signed = np.where(accepted, side * size, 0.0)
+    cost = np.where(accepted, signed * fill, 0.0)
+    fee = np.where(accepted, np.abs(signed) * fill * fee_rate, 0.0)
+    change = np.zeros((n, m))
+    change[rows, market] = signed
+    position_after = np.cumsum(change, axis=0)
+    position_before = position_after - change
+    cash_after = collateral - np.cumsum(cost + fee)
+    cash_before = cash_after + cost + fee
+    equity_before = cash_before + (position_before * marks).sum(axis=1)
+    free_before = equity_before - (np.abs(position_before) * marks).sum(axis=1) * imf
+    equity_after = cash_after + (position_after * marks).sum(axis=1)
+    return free_before, cash_before, position_before, equity_after, position_after, fee
+
+
+# Exact collateral gate from index start on, once the all-accepted fast path
+# hits the floor. Plain floats: per-signal NumPy calls would dominate here.
+def gate_sequentially(start, accepted, tradable, side, size, fill, market, marks, cash, position, imf, fee_rate):
+    accepted = accepted.copy()
+    position = position.tolist()
+    columns = range(len(position))
+    for i, row, can_trade, order_side, order_size, price, k in zip(
+        range(start, len(accepted)), marks[start:].tolist(), tradable[start:].tolist(),
+        side[start:].tolist(), size[start:].tolist(), fill[start:].tolist(), market[start:].tolist()
+    ):
+        free = cash
+        for j in columns:
+            free += position[j] * row[j] - abs(position[j]) * row[j] * imf
+        accepted[i] = can_trade and free > FREE_COLLATERAL_MIN
+        if accepted[i]:
+            signed = order_side * order_size
+            cash -= signed * price + abs(signed) * price * fee_rate
+            position[k] += signed
+    return accepted
+
+
+# Simulate one strategy's signals on its own account
+def simulate(strategy, columns, prices_dir, collateral, imf, fee_rate, slippage, keep_fills=False):
+    order = np.argsort(columns["time"], kind="stable")
+    times = columns["time"][order]
+    side = columns["side"][order].astype(np.float64)
+    size = columns["size"][order]
+    market_names, market = np.unique(columns["market"][order], return_inverse=True)
+    n, m = len(times), len(market_names)
+    rows = np.arange(n)
+
+    # Last known price of every market at every signal time
+    marks = np.zeros((n, m))
+    priced = np.zeros((n, m), dtype=bool)
+    last_prices = np.zeros(m)
+    for k, market_pair in enumerate(market_names):
+        series = load_prices(prices_dir, market_pair)
+        if len(series) == 0:
+            continue
+        index = np.searchsorted(series["time"], times, side="right") - 1
+        priced[:, k] = index >= 0
+        marks[:, k] = np.where(priced[:, k], series["price"][np.maximum(index, 0)], 0.0)
+        last_prices[k] = series["price"][-1]
+
+    has_price = priced[rows, market]
+    fill = marks[rows, market] * (1 + side * slippage)
+    # Market orders carry a limit MAX_SLIPPAGE_BPS beyond the price, past it they don't fill
+    bound = marks[rows, market] * (1 + side * MAX_SLIPPAGE_BPS / 10000)
+    within_range = side * (fill - bound) <= 0
+    tradable = has_price & within_range
+
+    accepted = tradable
+    free_before, cash_before, position_before, _, _, _ = account_path(
+        accepted, side, size, fill, market, marks, collateral, imf, fee_rate
+    )
+    floor = np.flatnonzero(accepted & (free_before <= FREE_COLLATERAL_MIN))
+    if len(floor):
+        start = floor[0]
+        accepted = gate_sequentially(
+            start, accepted, tradable, side, size, fill, market, marks,
+            cash_before[start], position_before[start], imf, fee_rate
+        )
+    _, _, _, equity_after, position_after, fee = account_path(
+        accepted, side, size, fill, market, marks, collateral, imf, fee_rate
+    )
+
+    final_position = position_after[-1] if n else np.zeros(m)
+    cash = collateral - np.sum(np.where(accepted, side * size * fill, 0.0)) - fee.sum()
+    final_equity = cash + final_position @ last_prices
+    equity_curve = np.concatenate(([collateral], equity_after[accepted]))
+    drawdown = np.maximum.accumulate(equity_curve) - equity_curve
+    result = {
+        "strategy": strategy,
+        "signals": int(n),
+        "filled": int(accepted.sum()),
+        "rejected_collateral": int((tradable & ~accepted).sum()),
+        "rejected_price": int((has_price & ~within_range).sum()),
+        "unpriced": int((~has_price).sum()),
+        "volume": round(float(np.sum(np.where(accepted, size * fill, 0.0))), 6),
+        "fees": round(float(fee.sum()), 6),
+        "final_equity": round(float(final_equity), 6),
+        "pnl": round(float(final_equity - collateral), 6),
+        "max_drawdown": round(float(drawdown.max()), 6),
+        "positions": {
+            market_pair: round(float(final_position[k]), 12)
+            for k, market_pair in enumerate(market_names) if final_position[k]
+        }
+    }
+    if keep_fills:
+        filled = np.flatnonzero(accepted)
+        result["fills"] = {
+            "time": times[filled], "market": market_names[market[filled]],
+            "side": side[filled], "size": size[filled], "price": fill[filled], "fee": fee[filled]
+        }
+    return result
+
+
+def simulate_shard(task):
+    return [simulate(*arguments) for arguments in task]
+
+
+def write_fills(path, results):
+    with open(path, "w") as f:
+        f.write("time,strategy,market_pair,order_side,order_size,price,fee\n")
+        for result in results:
+            fills = result.pop("fills")
+            for row in zip(fills["time"], fills["market"], fills["side"], fills["size"], fills["price"], fills["fee"]):
+                signal_time = np.datetime64(int(row[0]), "s")
+                side = "buy" if row[2] > 0 else "sell"
+                f.write(f"{signal_time}Z,{result['strategy']},{row[1]},{side},{row[3]:g},{row[4]:.8g},{row[5]:.8g}\n")
+
+
+def run(args):
+    started = time.perf_counter()
+    workers = max(1, args.workers)
+    bounds = chunk_bounds(args.signals, workers * 4)
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        chunks = list(pool.map(parse_chunk, [args.signals] * len(bounds), *zip(*bounds)))
+    else:
+        pool = None
+        chunks = [parse_chunk(args.signals, start, end) for start, end in bounds]
+    parsed = time.perf_counter()
+
+    columns = {
+        name: np.concatenate([chunk[name] for chunk in chunks]) if chunks else np.empty(0)
+        for name in ("strategy", "market", "time", "side", "size")
+    }
+    invalid = sum(chunk["invalid"] for chunk in chunks)
+    strategy_names, strategy = np.unique(columns["strategy"], return_inverse=True)
+    order = np.argsort(strategy, kind="stable")
+    splits = np.flatnonzero(np.diff(strategy[order])) + 1
+    tasks = [
+        (
+            str(strategy_names[strategy[group[0]]]),
+            {name: values[group] for name, values in columns.items()},
+            args.prices, args.collateral, args.imf, args.fee_bps / 10000, args.slippage_bps / 10000,
+            args.fills is not None
+        )
+        for group in np.split(order, splits) if len(group)
+    ]
+    # Shard by strategy, biggest strategies first so workers finish together
+    tasks.sort(key=lambda task: -len(task[1]["time"]))
+    shards = [tasks[i::workers] for i in range(workers)]
+    if pool is not None:
+        results = [result for shard in pool.map(simulate_shard, shards) for result in shard]
+        pool.shutdown()
+    else:
+        results = simulate_shard(tasks)
+    results.sort(key=lambda result: result["strategy"])
+    finished = time.perf_counter()
+
+    if args.fills:
+        write_fills(args.fills, results)
+    total = len(columns["time"]) + invalid
+    report = {
+        "config": {
+            "signals": args.signals, "prices": args.prices, "workers": workers,
+            "collateral": args.collateral, "imf": args.imf, "fee_bps": args.fee_bps,
+            "slippage_bps": args.slippage_bps,
+            "free_collateral_min": FREE_COLLATERAL_MIN, "max_slippage_bps": MAX_SLIPPAGE_BPS
+        },
+        "signals": total,
+        "invalid": invalid,
+        "parse_s": round(parsed - started, 3),
+        "simulate_s": round(finished - parsed, 3),
+        "signals_per_minute": round(total / (finished - started) * 60) if finished > started else None,
+        "strategies": results
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def import_prices(args):
+    data = np.loadtxt(args.csv, delimiter=",", dtype=str, skiprows=1 if args.header else 0, ndmin=2)
+    times = parse_times(list(data[:, 0])) if not data[0, 0].isdigit() else data[:, 0].astype(np.int64)
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{args.market}.npy")
+    write_prices(path, times, data[:, 1].astype(np.float64))
+    print(json.dumps({"market": args.market, "path": path, "points": len(times)}))
+
+
+# Random walk prices and random signals, for trying the engine out
+def synthesize(args):
+    rng = np.random.default_rng(args.seed)
+    os.makedirs(args.out, exist_ok=True)
+    prices_dir = os.path.join(args.out, "prices")
+    os.makedirs(prices_dir, exist_ok=True)
+    start = np.datetime64("2024-01-01T00:00:00", "s").astype(np.int64)
+    minutes = args.days * 24 * 60
+    markets = {"BTC-USD": 60000.0, "ETH-USD": 3000.0, "SOL-USD": 150.0}
+    times = start + np.arange(minutes) * 60
+    for market_pair, initial in markets.items():
+        walk = initial * np.exp(np.cumsum(rng.normal(0, 0.0008, minutes)))
+        write_prices(os.path.join(prices_dir, f"{market_pair}.npy"), times, walk)
+    sizes = {"BTC-USD": [0.001, 0.01], "ETH-USD": [0.01, 0.1], "SOL-USD": [0.1, 1.0]}
+    pairs = list(markets)
+    signal_times = np.sort(rng.integers(start, start + minutes * 60, args.signals))
+    stamps = np.datetime_as_string(signal_times.astype("datetime64[s]"))
+    strategy = rng.integers(0, args.strategies, args.signals)
+    market = rng.integers(0, len(pairs), args.signals)
+    side = rng.integers(0, 2, args.signals)
+    pick = rng.integers(0, 2, args.signals)
+    path = os.path.join(args.out, "signals.jsonl")
+    with open(path, "w") as f:
+        for i in range(args.signals):
+            market_pair = pairs[market[i]]
+            f.write(json.dumps({
+                "order_strategy": f"strategy-{strategy[i]}",
+                "signal_time": f"{stamps[i]}Z",
+                "signal_price": "0",
+                "market_pair": market_pair.replace("-USD", "USD.P"),
+                "order_side": "buy" if side[i] else "sell",
+                "order_size": str(sizes[market_pair][pick[i]])
+            }) + "\n")
+    print(json.dumps({"signals": path, "prices": prices_dir}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded webhook signals against a simulated exchange")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    replay = commands.add_parser("run", help="Replay a signal log")
+    replay.add_argument("--signals", required=True, help="JSON lines file of webhook bodies")
+    replay.add_argument("--prices", required=True, help="Directory of <market pair>.npy price files")
+    replay.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes, strategies are sharded across them")
+    replay.add_argument("--collateral", type=float, default=1000.0, help="Starting collateral of every strategy account")
+    replay.add_argument("--imf", type=float, default=0.05, help="Initial margin fraction")
+    replay.add_argument("--fee-bps", type=float, default=5.0, help="Taker fee")
+    replay.add_argument("--slippage-bps", type=float, default=0.0, help="Fill price slippage against the order side")
+    replay.add_argument("--fills", help="Write every fill to this CSV file")
+    replay.add_argument("--output", help="Write the JSON report to this file")
+    replay.set_defaults(handler=run)
+
+    prices = commands.add_parser("prices", help="Convert a time,price CSV into a price file")
+    prices.add_argument("--market", required=True, help="Market pair, e.g. BTC-USD")
+    prices.add_argument("--csv", required=True, help="CSV of epoch seconds or ISO time, price")
+    prices.add_argument("--header", action="store_true", help="Skip the first CSV line")
+    prices.add_argument("--out", required=True, help="Price file directory")
+    prices.set_defaults(handler=import_prices)
+
+    synth = commands.add_parser("synth", help="Generate sample signals and prices")
+    synth.add_argument("--signals", type=int, default=100000)
+    synth.add_argument("--strategies", type=int, default=8)
+    synth.add_argument("--days", type=int, default=30)
+    synth.add_argument("--seed", type=int, default=1)
+    synth.add_argument("--out", required=True)
+    synth.set_defaults(handler=synthesize)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Values served by the stub, matching what the CDK stacks store
+DEFAULT_SECRET = {
+    "address": "dydx1benchmarkaddress",
+    "mnemonic": "benchmark mnemonic"
+}
+DEFAULT_MESSAGE_CONFIG = {
+    "message_webhook_id": "benchmark",
+    "message_webhook_token": "benchmark"
+}
+
+
+# Answers the Secrets Manager and SSM JSON protocol calls the bot makes
+class AwsStubHandler(BaseHTTPRequestHandler):
+    secret = DEFAULT_SECRET
+    message_config = DEFAULT_MESSAGE_CONFIG
+    ip_list = "127.0.0.1"
+    latency = 0.0
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        target = self.headers.get("X-Amz-Target", "")
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if target == "secretsmanager.GetSecretValue":
+            body = {"Name": request.get("SecretId"), "SecretString": json.dumps(self.secret)}
+        elif target == "AmazonSSM.GetParameter":
+            name = request.get("Name")
+            value = self.ip_list if name == "webhook_ip_list" else json.dumps(self.message_config)
+            body = {"Parameter": {"Name": name, "Value": value}}
+        else:
+            self.send_response(400)
+            self.end_headers()
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-amz-json-1.1")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+# Start the stub on a free local port; returns the server and its URL
+def start_aws_stub(latency=0.0, secret=DEFAULT_SECRET, ip_list=AwsStubHandler.ip_list):
+    handler = type("AwsStub", (AwsStubHandler,), {"latency": latency, "secret": secret, "ip_list": ip_list})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+# Environment pointing boto3 at the stub instead of AWS
+def aws_stub_environ(url):
+    return {
+        "AWS_ACCESS_KEY_ID": "benchmark",
+        "AWS_SECRET_ACCESS_KEY": "benchmark",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_ENDPOINT_URL_SECRETS_MANAGER": url,
+        "AWS_ENDPOINT_URL_SSM": url,
+        "SECRET_NAME": "benchmark",
+        "MESSAGE_NAME": "discord_notification",
+        "REGION_NAME": "us-east-1",
+        "WEBHOOK_SSM_NAME": "webhook_ip_list"
+    }
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# Measure cold start initialisation of the trading Lambda and fail when it
+# regresses past a budget. Runs offline against a local Secrets Manager/SSM stub.
+#
+#   python benchmarks/cold_start.py --runs 5 --budget-ms 1500
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from aws_stub import start_aws_stub, aws_stub_environ
+
+BOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "docker-build")
+# Import the handler module, then load the trading stack as the first signal would
+COLD_START_SCRIPT = "import app, bootstrap; app.trading(); bootstrap.report()"
+
+
+def run_once(environ):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT],
+        cwd=BOT_DIR, env=environ, capture_output=True, text=True, check=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    # The last report includes the deferred trading import
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{"cold_start_ms"')]
+    timings = json.loads(lines[-1])["cold_start_ms"]
+    timings["process_wall"] = round(wall_ms, 2)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark for the trading Lambda")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0,
+                        help="Maximum median init_total in milliseconds")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    server, url = start_aws_stub()
+    environ = dict(os.environ)
+    environ.update(aws_stub_environ(url))
+    environ.update({"PREWARM_NODE": "0", "SEQUENCE_STORE": "none", "PYTHONDONTWRITEBYTECODE": "1"})
+    try:
+        runs = [run_once(environ) for _ in range(args.runs)]
+    finally:
+        server.shutdown()
+
+    phases = sorted({name for run in runs for name in run})
+    report = {
+        "runs": args.runs,
+        "budget_ms": args.budget_ms,
+        "median_ms": {name: round(statistics.median(run.get(name, 0.0) for run in runs), 2) for name in phases},
+        "max_ms": {name: round(max(run.get(name, 0.0) for run in runs), 2) for name in phases}
+    }
+    report["passed"] = report["median_ms"]["init_total"] <= args.budget_ms
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if not report["passed"]:
+        print(f"Cold start init {report['median_ms']['init_total']}ms exceeds budget {args.budget_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
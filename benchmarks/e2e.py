@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# Offline end-to-end latency benchmark for the trading Lambda handler.
+#
+# Every backend (dYdX node over gRPC, indexer REST, Secrets Manager, SSM and
+# Discord) is a local stand-in with configurable latency. Each run starts a
+# fresh interpreter: the first invocation is cold (init + handler), the rest
+# are warm. Reports p50/p95/p99 per phase as JSON.
+#
+#   python benchmarks/e2e.py --runs 5 --invocations 20 --node-latency-ms 30 --output report.json
+#   python benchmarks/e2e.py --compare baseline.json --tolerance 0.2
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from stats import percentile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.join(BENCHMARK_DIR, "..", "docker-build")
+# Warm phases compared against a baseline report
+COMPARED_PHASES = ("handler_total", "signal_to_order")
+
+
+def summarise(samples):
+    summary = {}
+    for kind in ("cold", "warm"):
+        rows = [sample for sample in samples if sample["kind"] == kind]
+        phases = sorted({name for row in rows for name in row if name not in ("kind", "run", "invocation")})
+        summary[kind] = {
+            name: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 3),
+                "p95": round(percentile(values, 95), 3),
+                "p99": round(percentile(values, 99), 3),
+                "max": round(max(values), 3)
+            }
+            for name in phases
+            for values in [[row[name] for row in rows if name in row]]
+        }
+    return summary
+
+
+def elapsed_ms(started, finished):
+    return round((finished - started) * 1000, 3)
+
+
+# Runs inside a fresh interpreter: start stand-ins, cold import the bot, invoke it
+def worker(args):
+    sys.path.insert(0, BENCHMARK_DIR)
+    from standins import StandIns
+    from events import make_signal, make_proxy_event
+
+    standins = StandIns(
+        node_latency=args.node_latency_ms / 1000,
+        indexer_latency=args.indexer_latency_ms / 1000,
+        aws_latency=args.aws_latency_ms / 1000,
+        discord_latency=args.discord_latency_ms / 1000
+    )
+    os.environ.update(standins.environ())
+    os.environ["PREWARM_NODE"] = "1" if args.prewarm else "0"
+    sys.path.insert(0, BOT_DIR)
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    import app
+    import bootstrap
+    init_ms = elapsed_ms(started, time.perf_counter())
+    cold_start = dict(bootstrap.timings)
+
+    samples = []
+    for invocation in range(args.invocations):
+        batch = [make_signal(rng) for _ in range(args.batch)]
+        event = make_proxy_event(batch if args.batch > 1 else batch[0])
+        broadcasts = len(standins.node.broadcasts)
+        started = time.perf_counter()
+        app.handler(event, None)
+        finished = time.perf_counter()
+        sample = {"run": args.run, "invocation": invocation, "kind": "cold" if invocation == 0 else "warm"}
+        sample["handler_total"] = elapsed_ms(started, finished)
+        if len(standins.node.broadcasts) > broadcasts:
+            first_broadcast = standins.node.broadcasts[broadcasts]
+            sample["signal_to_order"] = elapsed_ms(started, first_broadcast)
+            sample["post_order"] = elapsed_ms(first_broadcast, finished)
+        if invocation == 0:
+            sample["init_total"] = init_ms
+            sample["cold_total"] = round(init_ms + sample["handler_total"], 3)
+            for name, value in cold_start.items():
+                sample[f"init.{name}"] = value
+        samples.append(sample)
+    standins.stop()
+    print(json.dumps({"samples": samples}))
+
+
+def run_worker(args, run):
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker", "--run", str(run),
+        "--invocations", str(args.invocations), "--batch", str(args.batch),
+        "--seed", str(args.seed + run),
+        "--node-latency-ms", str(args.node_latency_ms),
+        "--indexer-latency-ms", str(args.indexer_latency_ms),
+        "--aws-latency-ms", str(args.aws_latency_ms),
+        "--discord-latency-ms", str(args.discord_latency_ms)
+    ]
+    if args.prewarm:
+        command.append("--prewarm")
+    environ = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(command, env=environ, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Benchmark run {run} failed")
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{"samples"')]
+    return json.loads(lines[-1])["samples"]
+
+
+# Fail when a warm phase p95 grew by more than the tolerance against the baseline
+def compare(report, baseline, tolerance):
+    regressions = []
+    for name in COMPARED_PHASES:
+        current = report["phases"]["warm"].get(name)
+        previous = baseline["phases"]["warm"].get(name)
+        if current is None or previous is None:
+            continue
+        change = (current["p95"] - previous["p95"]) / previous["p95"] if previous["p95"] else 0.0
+        report.setdefault("comparison", {})[name] = {
+            "baseline_p95": previous["p95"], "p95": current["p95"], "change": round(change, 4)
+        }
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end latency benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts (fresh interpreters)")
+    parser.add_argument("--invocations", type=int, default=20, help="Invocations per run, first one cold")
+    parser.add_argument("--batch", type=int, default=1, help="Signals per invocation")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--node-latency-ms", type=float, default=20.0)
+    parser.add_argument("--indexer-latency-ms", type=float, default=30.0)
+    parser.add_argument("--aws-latency-ms", type=float, default=15.0)
+    parser.add_argument("--discord-latency-ms", type=float, default=80.0)
+    parser.add_argument("--prewarm", action="store_true", help="Pre-warm the node connection during init")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth against the baseline")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--run", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    samples = []
+    for run in range(args.runs):
+        samples.extend(run_worker(args, run))
+    report = {
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("worker", "run", "output", "compare")
+        },
+        "phases": summarise(samples)
+    }
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if regressions:
+        raise SystemExit(f"Latency regressed past {args.tolerance:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
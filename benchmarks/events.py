@@ -0,0 +1,53 @@
+import json
+import random
+
+# TradingView alert source addresses (matches webhook_ip_allowed_list in app.py)
+TRADINGVIEW_IPS = ["52.89.214.238", "34.212.75.30", "54.218.53.128", "52.32.178.7"]
+MARKET_PAIRS = ["ETHUSD.P", "BTCUSD.P", "SOLUSD.P"]
+METHOD_ARN = "arn:aws:execute-api:us-east-1:123456789012:benchmark/prod/POST/webhook"
+
+
+# A signal in the format TradingView alerts post to the webhook
+def make_signal(rng=random, market_pair=None, order_side=None):
+    return {
+        "order_strategy": rng.choice(["breakout", "mean-reversion", "trend"]),
+        "signal_time": f"2024-10-23T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z",
+        "signal_price": f"{rng.uniform(100, 4000):.2f}",
+        "order_side": order_side or rng.choice(["buy", "sell"]),
+        "order_size": f"{rng.choice([0.001, 0.01, 0.1]):g}",
+        "market_pair": market_pair or rng.choice(MARKET_PAIRS)
+    }
+
+
+# API Gateway proxy event for the webhook resource
+def make_proxy_event(body, source_ip=None, method="POST"):
+    source_ip = source_ip or TRADINGVIEW_IPS[0]
+    event = {
+        "resource": "/webhook",
+        "path": "/webhook",
+        "httpMethod": method,
+        "headers": {"Content-Type": "application/json", "X-Forwarded-For": source_ip},
+        "queryStringParameters": None,
+        "body": None,
+        "requestContext": {"identity": {"sourceIp": source_ip}, "stage": "prod"},
+        "isBase64Encoded": False
+    }
+    if method == "GET":
+        event["queryStringParameters"] = body
+    else:
+        event["body"] = json.dumps(body)
+    return event
+
+
+# API Gateway REQUEST authorizer event for the custom authorizer
+def make_authorizer_event(source_ip=None, forwarded_for=None):
+    source_ip = source_ip or TRADINGVIEW_IPS[0]
+    return {
+        "type": "REQUEST",
+        "methodArn": METHOD_ARN,
+        "resource": "/webhook",
+        "path": "/webhook",
+        "httpMethod": "POST",
+        "headers": {"X-Forwarded-For": forwarded_for or source_ip},
+        "requestContext": {"identity": {"sourceIp": source_ip}, "stage": "prod"}
+    }
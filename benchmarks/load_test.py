@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# Local load test of the authorizer and webhook handler under concurrency.
+#
+# Each "container" is a worker process that calls customauthlambda.lambda_handler
+# and app.handler in-process, one request at a time, like a Lambda execution
+# environment. The driver replays an arrival pattern against a fixed number of
+# containers (the reserved concurrency) and either throttles requests arriving
+# while every container is busy, as Lambda does, or queues them (--queue).
+# AWS, the dYdX node/indexer and Discord are local stand-ins (see standins.py).
+#
+#   python benchmarks/load_test.py --pattern steady --rate 20 --duration 10 --containers 4
+#   python benchmarks/load_test.py --pattern burst --burst-size 30 --burst-interval 5
+#   python benchmarks/load_test.py --pattern herd --herd-size 50 --candle-seconds 15 --cold
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.join(BENCHMARK_DIR, "..", "docker-build")
+AUTHORIZER_DIR = os.path.join(BENCHMARK_DIR, "..", "custom_auth_lambda_function")
+sys.path.insert(0, BENCHMARK_DIR)
+
+from events import TRADINGVIEW_IPS, make_authorizer_event, make_proxy_event, make_signal  # noqa: E402
+from stats import percentile  # noqa: E402
+
+# Address outside the allow list, for denied traffic
+UNKNOWN_IP = "203.0.113.7"
+
+
+def distribution(values):
+    if not values:
+        return None
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3)
+    }
+
+
+# Arrival offsets in seconds from the start of the test
+def arrivals(args, rng):
+    if args.pattern == "steady":
+        count = int(args.rate * args.duration)
+        return [i / args.rate for i in range(count)]
+    if args.pattern == "burst":
+        bursts = max(1, int(args.duration / args.burst_interval))
+        return [burst * args.burst_interval for burst in range(bursts) for _ in range(args.burst_size)]
+    # Thundering herd: every strategy fires within a short spread after each candle close
+    candles = max(1, int(args.duration / args.candle_seconds))
+    spread = args.herd_spread_ms / 1000
+    return sorted(
+        candle * args.candle_seconds + rng.uniform(0, spread)
+        for candle in range(candles) for _ in range(args.herd_size)
+    )
+
+
+# One Lambda execution environment hosting both functions
+def container(connection, environ, warm):
+    os.environ.update(environ)
+    sys.path.insert(0, BOT_DIR)
+    sys.path.insert(0, AUTHORIZER_DIR)
+    # The functions print per invocation; keep the report readable
+    sys.stdout = open(os.devnull, "w")
+    functions = {}
+
+    def load():
+        started = time.perf_counter()
+        import customauthlambda
+        import app
+        functions.update(authorizer=customauthlambda.lambda_handler, handler=app.handler)
+        return (time.perf_counter() - started) * 1000
+
+    connection.send(("ready", load() if warm else None))
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        request_id, authorizer_event, proxy_event = message
+        result = {"id": request_id}
+        if not functions:
+            result["cold_start_ms"] = load()
+        if authorizer_event is not None:
+            started = time.perf_counter()
+            try:
+                functions["authorizer"](authorizer_event, None)
+                result["authorized"] = True
+            except Exception as e:
+                result["authorized"] = False
+                result["error"] = None if str(e) == "Unauthorized" else repr(e)
+            result["authorizer_ms"] = (time.perf_counter() - started) * 1000
+        if result.get("authorized", True):
+            started = time.perf_counter()
+            try:
+                result["status"] = functions["handler"](proxy_event, None)["statusCode"]
+            except Exception as e:
+                result["status"] = 502
+                result["error"] = repr(e)
+            result["handler_ms"] = (time.perf_counter() - started) * 1000
+        connection.send(result)
+
+
+# Hands requests to idle containers and records what happened to each
+class Driver:
+
+    def __init__(self, connections, queue_requests, authorizer_cache_ttl):
+        self.connections = connections
+        self.queue_requests = queue_requests
+        self.authorizer_cache_ttl = authorizer_cache_ttl
+        self.lock = threading.Lock()
+        self.idle = deque(range(len(connections)))
+        self.pending = deque()
+        self.arrived = {}
+        self.results = []
+        self.throttled = 0
+        self.outstanding = 0
+        self.done = threading.Event()
+        # API Gateway caches authorizer results per identity source (X-Forwarded-For)
+        self.authorized_at = {}
+
+    def _send(self, index, request):
+        request_id, forwarded_for, proxy_event = request
+        now = time.perf_counter()
+        cached = now - self.authorized_at.get(forwarded_for, -math.inf) < self.authorizer_cache_ttl
+        authorizer_event = None if cached else make_authorizer_event(forwarded_for)
+        self.connections[index].send((request_id, authorizer_event, proxy_event))
+
+    def submit(self, request):
+        with self.lock:
+            self.arrived[request[0]] = (time.perf_counter(), request[1])
+            self.outstanding += 1
+            if self.idle:
+                self._send(self.idle.popleft(), request)
+            elif self.queue_requests:
+                self.pending.append(request)
+            else:
+                self.throttled += 1
+                self.outstanding -= 1
+                del self.arrived[request[0]]
+
+    def receive(self, index):
+        connection = self.connections[index]
+        while True:
+            try:
+                result = connection.recv()
+            except EOFError:
+                return
+            finished = time.perf_counter()
+            with self.lock:
+                arrived, forwarded_for = self.arrived.pop(result["id"])
+                result["latency_ms"] = (finished - arrived) * 1000
+                if result.get("authorized"):
+                    self.authorized_at[forwarded_for] = finished
+                self.results.append(result)
+                if self.pending:
+                    self._send(index, self.pending.popleft())
+                else:
+                    self.idle.append(index)
+                self.outstanding -= 1
+                if self.outstanding == 0:
+                    self.done.set()
+
+
+def summarise(results, throttled, total, elapsed):
+    completed = [result for result in results if result.get("status") is not None and result["status"] < 500]
+    denied = [result for result in results if result.get("authorized") is False and result.get("error") is None]
+    errors = [result for result in results if result.get("error") is not None or result.get("status", 0) >= 500]
+    statuses = {}
+    for result in results:
+        if result.get("status") is not None:
+            statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    return {
+        "requests": total,
+        "completed": len(completed),
+        "denied": len(denied),
+        "throttled": throttled,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / total, 4) if total else 0.0,
+        "throttle_rate": round(throttled / total, 4) if total else 0.0,
+        "throughput_rps": round(len(completed) / elapsed, 2) if elapsed else None,
+        "statuses": statuses,
+        "cold_starts": sum(1 for result in results if "cold_start_ms" in result),
+        "latency_ms": distribution([result["latency_ms"] for result in results]),
+        "authorizer_ms": distribution([result["authorizer_ms"] for result in results if "authorizer_ms" in result]),
+        "handler_ms": distribution([result["handler_ms"] for result in results if "handler_ms" in result]),
+        "cold_start_ms": distribution([result["cold_start_ms"] for result in results if "cold_start_ms" in result]),
+        "sample_errors": sorted({result["error"] for result in errors if result.get("error")})[:5]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local load test of the authorizer and webhook handler")
+    parser.add_argument("--pattern", choices=("steady", "burst", "herd"), default="steady")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of arrivals")
+    parser.add_argument("--rate", type=float, default=20.0, help="Requests per second (steady)")
+    parser.add_argument("--burst-size", type=int, default=20, help="Requests per burst (burst)")
+    parser.add_argument("--burst-interval", type=float, default=2.0, help="Seconds between bursts (burst)")
+    parser.add_argument("--herd-size", type=int, default=40, help="Alerts per candle close (herd)")
+    parser.add_argument("--candle-seconds", type=float, default=5.0, help="Candle length (herd)")
+    parser.add_argument("--herd-spread-ms", type=float, default=250.0, help="Spread of alerts after a close (herd)")
+    parser.add_argument("--containers", type=int, default=4, help="Concurrent execution environments (reserved concurrency)")
+    parser.add_argument("--queue", action="store_true", help="Queue requests while every container is busy instead of throttling")
+    parser.add_argument("--cold", action="store_true", help="Initialise containers on their first request instead of up front")
+    parser.add_argument("--authorizer-cache-ttl", type=float, default=300.0, help="API Gateway authorizer result cache TTL, 0 to disable")
+    parser.add_argument("--unauthorized-rate", type=float, default=0.0, help="Share of requests from outside the allow list")
+    parser.add_argument("--batch", type=int, default=1, help="Signals per request")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--node-latency-ms", type=float, default=20.0)
+    parser.add_argument("--indexer-latency-ms", type=float, default=30.0)
+    parser.add_argument("--aws-latency-ms", type=float, default=15.0)
+    parser.add_argument("--discord-latency-ms", type=float, default=80.0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    from standins import StandIns
+    rng = random.Random(args.seed)
+    standins = StandIns(
+        node_latency=args.node_latency_ms / 1000,
+        indexer_latency=args.indexer_latency_ms / 1000,
+        aws_latency=args.aws_latency_ms / 1000,
+        discord_latency=args.discord_latency_ms / 1000,
+        # Collateral reservations must not run out during the test
+        free_collateral="1000000000000",
+        ip_list=",".join(TRADINGVIEW_IPS)
+    )
+    environ = dict(standins.environ(), METRICS_EMF="0", PREWARM_NODE="0" if args.cold else "1")
+
+    context = multiprocessing.get_context("spawn")
+    connections = []
+    workers = []
+    for _ in range(args.containers):
+        parent, child = context.Pipe()
+        worker = context.Process(target=container, args=(child, environ, not args.cold), daemon=True)
+        worker.start()
+        connections.append(parent)
+        workers.append(worker)
+    init_ms = [connection.recv()[1] for connection in connections]
+
+    driver = Driver(connections, args.queue, args.authorizer_cache_ttl)
+    for index in range(len(connections)):
+        threading.Thread(target=driver.receive, args=(index,), daemon=True).start()
+
+    schedule = arrivals(args, rng)
+    started = time.perf_counter()
+    for request_id, offset in enumerate(schedule):
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        signals = []
+        for i in range(args.batch):
+            signal = make_signal(rng)
+            # Unique per request so the deduplicator never answers
+            signal["order_strategy"] = f"load-{request_id}-{i}"
+            signals.append(signal)
+        forwarded_for = UNKNOWN_IP if rng.random() < args.unauthorized_rate else rng.choice(TRADINGVIEW_IPS)
+        event = make_proxy_event(signals if args.batch > 1 else signals[0], forwarded_for)
+        driver.submit((request_id, forwarded_for, event))
+    with driver.lock:
+        if driver.outstanding == 0:
+            driver.done.set()
+    # Containers that die never answer; give up on them eventually
+    driver.done.wait(args.duration + 300)
+    elapsed = time.perf_counter() - started
+
+    for connection in connections:
+        connection.send(None)
+    for worker in workers:
+        worker.join(timeout=10)
+    standins.stop()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "elapsed_s": round(elapsed, 3),
+        "offered_rps": round(len(schedule) / elapsed, 2) if elapsed else None,
+        "container_init_ms": distribution([value for value in init_ms if value is not None]),
+        "broadcasts": len(standins.node.broadcasts),
+        "results": summarise(driver.results, driver.throttled, len(schedule), elapsed)
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import json
+import re
+import threading
+import time
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import grpc
+from google.protobuf.any_pb2 import Any
+from v4_proto.cosmos.auth.v1beta1 import query_pb2 as auth_query
+from v4_proto.cosmos.auth.v1beta1 import query_pb2_grpc as auth_query_grpc
+from v4_proto.cosmos.auth.v1beta1.auth_pb2 import BaseAccount
+from v4_proto.cosmos.base.abci.v1beta1.abci_pb2 import TxResponse
+from v4_proto.cosmos.base.tendermint.v1beta1 import query_pb2 as tendermint_query
+from v4_proto.cosmos.base.tendermint.v1beta1 import query_pb2_grpc as tendermint_query_grpc
+from v4_proto.cosmos.tx.v1beta1 import service_pb2 as tx_service
+from v4_proto.cosmos.tx.v1beta1 import service_pb2_grpc as tx_service_grpc
+
+from aws_stub import AwsStubHandler, start_aws_stub, aws_stub_environ
+
+# A valid BIP-39 test mnemonic; the stand-in node never checks signatures
+TEST_MNEMONIC = " ".join(["abandon"] * 11 + ["about"])
+TEST_ADDRESS = "dydx1benchmarkaddress"
+
+# Perpetual market metadata in the shape the indexer returns
+MARKETS = {
+    "BTC-USD": {
+        "ticker": "BTC-USD", "clobPairId": "0", "status": "ACTIVE", "oraclePrice": "60000",
+        "atomicResolution": -10, "quantumConversionExponent": -9, "stepBaseQuantums": 1000000,
+        "subticksPerTick": 100000, "tickSize": "1", "stepSize": "0.0001"
+    },
+    "ETH-USD": {
+        "ticker": "ETH-USD", "clobPairId": "1", "status": "ACTIVE", "oraclePrice": "3000",
+        "atomicResolution": -9, "quantumConversionExponent": -9, "stepBaseQuantums": 1000000,
+        "subticksPerTick": 100000, "tickSize": "0.1", "stepSize": "0.001"
+    },
+    "SOL-USD": {
+        "ticker": "SOL-USD", "clobPairId": "5", "status": "ACTIVE", "oraclePrice": "150",
+        "atomicResolution": -7, "quantumConversionExponent": -9, "stepBaseQuantums": 1000000,
+        "subticksPerTick": 1000000, "tickSize": "0.01", "stepSize": "0.1"
+    }
+}
+SUBACCOUNT_PATH = re.compile(r"^/v4/addresses/([^/]+)/subaccountNumber/(\d+)$")
+ORDER_BOOK_PATH = re.compile(r"^/v4/orderbooks/perpetualMarket/([^/]+)$")
+
+
+# Ten levels either side of the oracle price, one tick apart
+def order_book(market):
+    price, tick = float(market["oraclePrice"]), float(market["tickSize"])
+    return {
+        "bids": [{"price": str(price - tick * (i + 1)), "size": "10"} for i in range(10)],
+        "asks": [{"price": str(price + tick * (i + 1)), "size": "10"} for i in range(10)]
+    }
+
+
+def send_json(handler, status, body):
+    data = json.dumps(body).encode()
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
+def start_http(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+# Indexer REST stand-in serving market metadata, order books and a funded subaccount
+class IndexerHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    free_collateral = "100000"
+    requests = None
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        self.requests.append((time.perf_counter(), url.path))
+        if url.path == "/v4/perpetualMarkets":
+            ticker = parse_qs(url.query).get("ticker", [None])[0]
+            if ticker is None:
+                send_json(self, 200, {"markets": MARKETS})
+            elif ticker in MARKETS:
+                send_json(self, 200, {"markets": {ticker: MARKETS[ticker]}})
+            else:
+                send_json(self, 404, {"errors": [{"msg": f"{ticker} not found"}]})
+            return
+        match = ORDER_BOOK_PATH.match(url.path)
+        if match:
+            if match.group(1) in MARKETS:
+                send_json(self, 200, order_book(MARKETS[match.group(1)]))
+            else:
+                send_json(self, 404, {"errors": [{"msg": f"{match.group(1)} not found"}]})
+            return
+        match = SUBACCOUNT_PATH.match(url.path)
+        if match:
+            send_json(self, 200, {"subaccount": {
+                "address": match.group(1), "subaccountNumber": int(match.group(2)),
+                "equity": self.free_collateral, "freeCollateral": self.free_collateral,
+                "openPerpetualPositions": {}, "assetPositions": {}, "marginEnabled": True
+            }})
+            return
+        send_json(self, 404, {"errors": [{"msg": "not found"}]})
+
+    def log_message(self, *args):
+        pass
+
+
+# Discord webhook stand-in that reports a rate limit bucket like the real API
+class DiscordHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    messages = None
+
+    def do_POST(self):
+        time.sleep(self.latency)
+        self.messages.append(json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0)))))
+        self.send_response(204)
+        self.send_header("X-RateLimit-Limit", "5")
+        self.send_header("X-RateLimit-Remaining", "4")
+        self.send_header("X-RateLimit-Reset-After", "1")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+# gRPC node stand-in answering the block height, account and broadcast calls
+class FakeNode(tendermint_query_grpc.ServiceServicer, auth_query_grpc.QueryServicer, tx_service_grpc.ServiceServicer):
+
+    def __init__(self, latency=0.0, block_interval=1.0, start_height=1000000):
+        self.latency = latency
+        self.block_interval = block_interval
+        self.start_height = start_height
+        self.started = time.monotonic()
+        self.sequence = 0
+        self.broadcasts = []
+        self.lock = threading.Lock()
+
+    def height(self):
+        return self.start_height + int((time.monotonic() - self.started) / self.block_interval)
+
+    def GetLatestBlock(self, request, context):
+        time.sleep(self.latency)
+        response = tendermint_query.GetLatestBlockResponse()
+        response.block.header.height = self.height()
+        return response
+
+    def Account(self, request, context):
+        time.sleep(self.latency)
+        account = Any()
+        account.Pack(BaseAccount(address=request.address, account_number=1, sequence=self.sequence))
+        return auth_query.QueryAccountResponse(account=account)
+
+    def BroadcastTx(self, request, context):
+        received = time.perf_counter()
+        time.sleep(self.latency)
+        with self.lock:
+            self.broadcasts.append(received)
+            self.sequence += 1
+            txhash = f"{len(self.broadcasts):064X}"
+        return tx_service.BroadcastTxResponse(tx_response=TxResponse(code=0, txhash=txhash, height=self.height()))
+
+
+def start_fake_node(node):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=16))
+    tendermint_query_grpc.add_ServiceServicer_to_server(node, server)
+    auth_query_grpc.add_QueryServicer_to_server(node, server)
+    tx_service_grpc.add_ServiceServicer_to_server(node, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, f"127.0.0.1:{port}"
+
+
+# Every backend the bot talks to, running locally with injected latency
+class StandIns:
+
+    def __init__(self, node_latency=0.0, indexer_latency=0.0, aws_latency=0.0, discord_latency=0.0,
+                 free_collateral=IndexerHandler.free_collateral, ip_list=AwsStubHandler.ip_list, accounts=None):
+        self.indexer_requests = []
+        self.discord_messages = []
+        self.node = FakeNode(node_latency)
+        self.node_server, self.node_url = start_fake_node(self.node)
+        self.indexer_server, self.indexer_url = start_http(type("Indexer", (IndexerHandler,), {
+            "latency": indexer_latency, "requests": self.indexer_requests, "free_collateral": free_collateral
+        }))
+        self.discord_server, self.discord_url = start_http(type("Discord", (DiscordHandler,), {
+            "latency": discord_latency, "messages": self.discord_messages
+        }))
+        # accounts: the secret's "accounts" list, to fan signals out to several accounts
+        secret = {"address": TEST_ADDRESS, "mnemonic": TEST_MNEMONIC}
+        if accounts is not None:
+            secret["accounts"] = accounts
+        self.aws_server, self.aws_url = start_aws_stub(aws_latency, secret=secret, ip_list=ip_list)
+
+    # Environment for the bot so every call lands on a stand-in
+    def environ(self):
+        environ = aws_stub_environ(self.aws_url)
+        environ.update({
+            "DYDX_NODE_URL": self.node_url,
+            "DYDX_NODE_INSECURE": "1",
+            "DYDX_INDEXER_URL": self.indexer_url,
+            "DISCORD_API_URL": self.discord_url,
+            "SEQUENCE_STORE": "none",
+            "SUBACCOUNT_WEBSOCKET": "0",
+            "ORDER_BOOK_WEBSOCKET": "0",
+            "DEDUP_STORE": "none"
+        })
+        return environ
+
+    def stop(self):
+        self.node_server.stop(None)
+        for server in (self.indexer_server, self.discord_server, self.aws_server):
+            server.shutdown()
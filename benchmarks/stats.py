@@ -0,0 +1,8 @@
+import math
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
@@ -1,12 +1,44 @@
 import os
+import json
+import time
+import ipaddress
 import boto3
 from botocore.exceptions import ClientError
 
-def lambda_handler(event, context):
-    print(event)
+# Seconds the approved IP list is served from memory before SSM is read again
+ALLOW_LIST_TTL = float(os.environ.get('ALLOW_LIST_TTL', 300))
+# Comma separated proxies/CIDRs in front of API Gateway to skip in X-Forwarded-For
+TRUSTED_PROXIES = os.environ.get('TRUSTED_PROXIES', '')
+# CloudWatch namespace for the Embedded Metric Format lines printed per invocation
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'AutoTradingBot')
+
+# Kept across warm invocations
+ssm_client = None
+allow_list = None
+allow_list_loaded_at = 0.0
+
+# Print millisecond metrics as a CloudWatch Embedded Metric Format record
+def emit_metrics(event_name, values, properties=None):
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Service', 'Event']],
+                'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in values]
+            }]
+        },
+        'Service': 'authorizer',
+        'Event': event_name
+    }
+    record.update(properties or {})
+    record.update({name: round(value, 3) for name, value in values.items()})
+    print(json.dumps(record))
 
+def lambda_handler(event, context):
+    started = time.perf_counter()
     # Retrieve request parameters from the Lambda function input:
-    headers = event['headers']
+    headers = event.get('headers') or {}
 
     # Parse the input for the parameter values
     tmp = event['methodArn'].split(':')
@@ -17,29 +49,104 @@ def lambda_handler(event, context):
         resource += apiGatewayArnTmp[3]
     ssm_name = os.environ['WEBHOOK_SSM_NAME']
     region_name = os.environ['REGION_NAME']
-    approved_ip_list = get_ssm_parameter_list(ssm_name, region_name)
-    print(approved_ip_list)
+    approved = get_allow_list(ssm_name, region_name)
+    client_ip = get_client_ip(headers, event)
 
     # Perform authorization to return the Allow policy for correct parameters
     # and the 'Unauthorized' error, otherwise.
-    if headers['X-Forwarded-For'] in approved_ip_list:
+    authorized = client_ip is not None and approved.contains(client_ip)
+    emit_metrics('authorize', {'authorize': (time.perf_counter() - started) * 1000}, {'authorized': authorized})
+    if authorized:
         response = generateAllow('XForwardForAuthorized', event['methodArn'])
-        print('authorized')
+        print(f'authorized {client_ip}')
         return response
     else:
-        print('unauthorized')
+        print(f'unauthorized {client_ip}')
         raise Exception('Unauthorized') # Return a 401 Unauthorized response
 
+# Approved IPs and CIDR ranges compiled for constant time lookups
+class AllowList:
+
+    def __init__(self, entries):
+        self.addresses = set()
+        # Networks grouped by (version, prefix length) so a lookup masks the
+        # client address once per distinct prefix instead of scanning ranges
+        self.networks = {}
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            try:
+                if '/' in entry:
+                    network = ipaddress.ip_network(entry, strict=False)
+                    key = (network.version, network.prefixlen)
+                    self.networks.setdefault(key, set()).add(network)
+                else:
+                    self.addresses.add(ipaddress.ip_address(entry))
+            except ValueError:
+                print(f'Ignoring invalid allow list entry: {entry}')
+
+    def contains(self, ip):
+        if ip in self.addresses:
+            return True
+        for (version, prefixlen), networks in self.networks.items():
+            if version == ip.version and ipaddress.ip_network((ip, prefixlen), strict=False) in networks:
+                return True
+        return False
+
+def get_allow_list(ssm_name, region):
+    global allow_list, allow_list_loaded_at
+    now = time.monotonic()
+    if allow_list is None or now - allow_list_loaded_at > ALLOW_LIST_TTL:
+        try:
+            fetch_started = time.perf_counter()
+            entries = get_ssm_parameter_list(ssm_name, region)
+            emit_metrics('allow_list_fetch', {'ssm_fetch': (time.perf_counter() - fetch_started) * 1000})
+            allow_list = AllowList(entries)
+            allow_list_loaded_at = now
+        except ClientError as e:
+            # Keep serving the previous list if SSM throttles or fails
+            if allow_list is None:
+                raise e
+            print(f'Failed to refresh allow list: {e}')
+    return allow_list
+
+trusted_proxies = AllowList(TRUSTED_PROXIES.split(','))
+
+# Client address from the X-Forwarded-For chain. API Gateway appends the
+# connecting address on the right, so walk from the right past trusted proxies;
+# entries further left are client supplied and can't be trusted.
+def get_client_ip(headers, event):
+    forwarded_for = None
+    for name, value in headers.items():
+        if name.lower() == 'x-forwarded-for':
+            forwarded_for = value
+            break
+    chain = [hop.strip() for hop in (forwarded_for or '').split(',') if hop.strip()]
+    if not chain:
+        source_ip = event.get('requestContext', {}).get('identity', {}).get('sourceIp')
+        chain = [source_ip] if source_ip else []
+    for hop in reversed(chain):
+        try:
+            ip = ipaddress.ip_address(hop)
+        except ValueError:
+            return None
+        if not trusted_proxies.contains(ip):
+            return ip
+    return None
+
 # Get Parameter List for approved IP list
 def get_ssm_parameter_list(ssm_name, region):
-    # Create a SSM client
-    session = boto3.session.Session()
-    client = session.client(
-        service_name="ssm",
-        region_name=region
-    )
+    global ssm_client
+    # Create a SSM client once per container
+    if ssm_client is None:
+        session = boto3.session.Session()
+        ssm_client = session.client(
+            service_name="ssm",
+            region_name=region
+        )
     try:
-        get_ssm_params_response = client.get_parameter(Name=ssm_name)
+        get_ssm_params_response = ssm_client.get_parameter(Name=ssm_name)
     except ClientError as e:
         raise e
     ssm_params_list = get_ssm_params_response["Parameter"]["Value"].split(",")
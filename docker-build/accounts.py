@@ -0,0 +1,61 @@
+from connection import connections
+from risk import FREE_COLLATERAL_MIN
+from sequence_manager import get_sequence_manager
+from subaccount_state import get_subaccount_state
+
+DEFAULT_ACCOUNT = "default"
+
+
+# One subaccount a signal is traded on, with its own order sizing and
+# collateral floor. Subaccounts of the same wallet share its sequence stream.
+class Account:
+
+    def __init__(self, name, address, mnemonic, subaccount_number=0, size_multiplier=1.0,
+                 free_collateral_min=FREE_COLLATERAL_MIN, strategies=None, region=None):
+        self.name = name
+        self.address = address
+        self.mnemonic = mnemonic
+        self.subaccount_number = int(subaccount_number)
+        self.size_multiplier = float(size_multiplier)
+        self.free_collateral_min = float(free_collateral_min)
+        # Strategies this account trades, None for every strategy
+        self.strategies = None if strategies is None else set(strategies)
+        self.sequences = get_sequence_manager(address, region)
+        self.subaccount = get_subaccount_state(address, self.subaccount_number)
+
+    def trades(self, order_strategy) -> bool:
+        return self.strategies is None or order_strategy in self.strategies
+
+    def order_size(self, order_size: float) -> float:
+        return order_size * self.size_multiplier
+
+    # Scheduler lane: an account's orders for one market are placed in order,
+    # other accounts and markets in parallel
+    def lane(self, market_pair: str) -> str:
+        return market_pair if self.name == DEFAULT_ACCOUNT else f"{self.name}/{market_pair}"
+
+    async def load_wallet(self):
+        await self.sequences.ready()
+        return await connections.get_wallet(self.mnemonic, self.address, self.sequences.account_number)
+
+
+# Accounts from the bot secret. Without an "accounts" list the secret's own
+# wallet trades subaccount 0; list entries default to that wallet too:
+# {"address": ..., "mnemonic": ..., "accounts": [
+#     {"name": "main"},
+#     {"name": "half", "subaccount_number": 1, "size_multiplier": 0.5, "free_collateral_min": 50},
+#     {"name": "other", "address": ..., "mnemonic": ..., "strategies": ["breakout"]}]}
+def load_accounts(dydx_secret, region=None) -> list:
+    entries = dydx_secret.get("accounts") or [{"name": DEFAULT_ACCOUNT}]
+    accounts = []
+    for i, entry in enumerate(entries):
+        entry = dict(entry)
+        name = entry.pop("name", f"account-{i}")
+        address = entry.pop("address", dydx_secret.get("address"))
+        mnemonic = entry.pop("mnemonic", dydx_secret.get("mnemonic") if address == dydx_secret.get("address") else None)
+        if not address or not mnemonic:
+            raise ValueError(f"Account {name} needs an address and mnemonic")
+        accounts.append(Account(name, address, mnemonic, region=region, **entry))
+    if len({account.name for account in accounts}) != len(accounts):
+        raise ValueError("Account names must be unique")
+    return accounts
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+
+from connection import connections
+
+logger = logging.getLogger(__name__)
+
+# Assumed block interval until enough heights have been observed
+DEFAULT_BLOCK_INTERVAL = 1.0
+# Seconds between background resyncs with the node
+BLOCK_RESYNC_SECONDS = float(os.environ.get("BLOCK_RESYNC_SECONDS", 30))
+# How long a short-term order should stay valid, converted to blocks
+GOOD_TIL_SECONDS = float(os.environ.get("GOOD_TIL_SECONDS", 10))
+# Short-term orders may not be more than 20 blocks ahead, keep a margin for drift
+MIN_GOOD_TIL_BLOCKS = 3
+MAX_GOOD_TIL_BLOCKS = 15
+# Height observations kept to average the block interval
+BLOCK_SAMPLES = 20
+
+
+# Locally extrapolated chain height so orders don't wait on a node round trip
+class BlockHeightTracker:
+
+    def __init__(self, connections, resync_interval=BLOCK_RESYNC_SECONDS, good_til_seconds=GOOD_TIL_SECONDS):
+        self.connections = connections
+        self.resync_interval = resync_interval
+        self.good_til_seconds = good_til_seconds
+        self.samples = deque(maxlen=BLOCK_SAMPLES)
+        self.block_interval = DEFAULT_BLOCK_INTERVAL
+        self.sync_task = None
+
+    def observe(self, height: int, observed_at: float = None):
+        observed_at = time.monotonic() if observed_at is None else observed_at
+        self.samples.append((observed_at, height))
+        first_at, first_height = self.samples[0]
+        if height > first_height:
+            self.block_interval = (observed_at - first_at) / (height - first_height)
+
+    async def sync(self):
+        height = await self.connections.call_node(lambda node: node.latest_block_height(), hedge=True)
+        self.observe(height)
+        return height
+
+    async def _background_sync(self):
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.warning(f"Block height resync failed: {e}")
+        finally:
+            self.sync_task = None
+
+    def resync_in_background(self):
+        if self.sync_task is None:
+            self.sync_task = asyncio.ensure_future(self._background_sync())
+
+    # Last observed height plus the blocks expected since, rounded down
+    def current(self) -> int:
+        observed_at, height = self.samples[-1]
+        return height + math.floor((time.monotonic() - observed_at) / self.block_interval)
+
+    async def get(self) -> int:
+        if not self.samples:
+            return await self.sync()
+        if time.monotonic() - self.samples[-1][0] > self.resync_interval:
+            self.resync_in_background()
+        return self.current()
+
+    def good_til_window(self) -> int:
+        blocks = math.ceil(self.good_til_seconds / self.block_interval)
+        return min(max(blocks, MIN_GOOD_TIL_BLOCKS), MAX_GOOD_TIL_BLOCKS)
+
+    async def good_til_block(self) -> int:
+        return await self.get() + self.good_til_window()
+
+    # Resync when the chain rejected an order for its good_til_block
+    def check_rejection(self, transaction):
+        tx_response = getattr(transaction, "tx_response", None)
+        if tx_response is None or not tx_response.code:
+            return
+        if "goodtilblock" in tx_response.raw_log.lower():
+            logger.warning(f"Order rejected for good_til_block, resyncing height: {tx_response.raw_log}")
+            self.resync_in_background()
+
+
+block_tracker = BlockHeightTracker(connections)
@@ -0,0 +1,110 @@
+import time
+# Taken before anything else is imported so the boto3 import is counted too
+init_started = time.perf_counter()
+
+import asyncio
+import importlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import boto3
+
+import metrics
+from utils import get_secret, get_ssm_parameter
+
+# Connect to the node and warm caches during init instead of on the first signal
+PREWARM_NODE = os.environ.get("PREWARM_NODE", "1") == "1"
+# Longest init waits on the prewarm, so a slow node can't push init past
+# Lambda's 10 second limit; what is unfinished carries on in the first invocation
+PREWARM_BUDGET_SECONDS = float(os.environ.get("PREWARM_BUDGET_SECONDS", 3))
+
+# Milliseconds spent in each cold start phase, in the order they finished
+timings = {}
+executor = ThreadPoolExecutor(max_workers=3)
+modules = {}
+configured = set()
+# Prewarm tasks still running when init stopped waiting on them
+unfinished = set()
+
+@contextmanager
+def phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+def timed(name, fn, *args):
+    with phase(name):
+        return fn(*args)
+
+
+# Secret, message config and optional endpoint config requested together on worker threads
+class ConfigFetch:
+
+    def __init__(self, secret, message_config, endpoints=None):
+        self.secret = secret
+        self.message_config = message_config
+        self.endpoints = endpoints
+
+    def result(self):
+        with phase("wait_config"):
+            return self.secret.result(), self.message_config.result()
+
+    # The dYdX endpoint config, or None to use the environment's endpoints
+    def endpoints_result(self):
+        if self.endpoints is None:
+            return None
+        with phase("wait_endpoints"):
+            return self.endpoints.result()
+
+# Start the AWS fetches over clients from one shared session
+def fetch_config(secret_name, message_name, region, endpoints_name=None) -> ConfigFetch:
+    with phase("aws_clients"):
+        session = boto3.session.Session()
+        secrets_client = session.client(service_name="secretsmanager", region_name=region)
+        ssm_client = session.client(service_name="ssm", region_name=region)
+    # boto3 calls block, so each runs to completion on its own thread
+    secret = executor.submit(
+        timed, "secret", asyncio.run, get_secret(secret_name, region, secrets_client)
+    )
+    message_config = executor.submit(
+        timed, "ssm", asyncio.run, get_ssm_parameter(message_name, region, ssm_client)
+    )
+    endpoints = None
+    if endpoints_name:
+        endpoints = executor.submit(
+            timed, "ssm_endpoints", asyncio.run, get_ssm_parameter(endpoints_name, region, ssm_client)
+        )
+    return ConfigFetch(secret, message_config, endpoints)
+
+# Import a heavy module the first time it is needed, running setup once
+def load_module(name, setup=None):
+    module = modules.get(name)
+    if module is None:
+        with phase(f"import_{name}"):
+            module = importlib.import_module(name)
+        modules[name] = module
+    if setup is not None and name not in configured:
+        setup(module)
+        configured.add(name)
+    return module
+
+# Run coroutine on loop for at most budget seconds. Past that it is left
+# running, to finish the next time the loop runs, i.e. during the first invocation.
+def run_bounded(loop, coroutine, budget=PREWARM_BUDGET_SECONDS):
+    task = loop.create_task(coroutine)
+    loop.run_until_complete(asyncio.wait({task}, timeout=budget))
+    if not task.done():
+        print(f"Prewarm still running after {budget}s, finishing it in the first invocation")
+        unfinished.add(task)
+        task.add_done_callback(unfinished.discard)
+    return task
+
+def report():
+    timings["init_total"] = round((time.perf_counter() - init_started) * 1000, 2)
+    print(json.dumps({"cold_start_ms": timings}))
+    metrics.emit("cold_start", timings)
+    return dict(timings)
@@ -0,0 +1,366 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+import httpx
+from dydx_v4_client.indexer.rest.indexer_client import IndexerClient
+from dydx_v4_client.indexer.rest.utils.request_helpers import generate_query_path
+from dydx_v4_client.key_pair import KeyPair
+from dydx_v4_client.network import mainnet_node, make_insecure, make_secure, testnet_node
+from dydx_v4_client.node.client import NodeClient
+from dydx_v4_client.wallet import Wallet
+
+import metrics
+from endpoint_pool import EndpointPool
+
+logger = logging.getLogger(__name__)
+
+# Seconds a node call may take before it fails with DEADLINE_EXCEEDED
+NODE_CALL_TIMEOUT = float(os.environ.get("NODE_CALL_TIMEOUT", 3))
+# gRPC status codes which mean the channel itself is broken and must be
+# rebuilt. A deadline counts too: a node that accepts the connection and then
+# hangs never reports UNAVAILABLE.
+RECONNECT_STATUS_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.CANCELLED,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+)
+# gRPC status codes blamed on the node rather than the request, so the call
+# moves on to another node. A broadcast repeated on a second node is the same
+# signed transaction, which the chain accepts at most once; see broadcast().
+NODE_FAILOVER_STATUS_CODES = RECONNECT_STATUS_CODES + (
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+)
+# Cosmos SDK ErrTxInMempoolCache: a node already holds this exact transaction
+TX_IN_CACHE_CODE = 19
+# Channel states in which a cached channel is not reused
+STALE_CHANNEL_STATES = (
+    grpc.ChannelConnectivity.TRANSIENT_FAILURE,
+    grpc.ChannelConnectivity.SHUTDOWN,
+)
+# Channels left unused for longer than this are rebuilt rather than trusted
+CHANNEL_MAX_IDLE_SECONDS = 300
+# Worker threads for blocking node calls, bounding the broadcasts in flight at once
+NODE_CALL_THREADS = int(os.environ.get("NODE_CALL_THREADS", 32))
+# dYdX chain ("testnet" or "mainnet") and endpoints, overridable e.g. to point
+# at local stand-ins. Node and indexer URLs take comma separated lists.
+DYDX_NETWORK = os.environ.get("DYDX_NETWORK", "testnet")
+DYDX_NODE_URL = os.environ.get("DYDX_NODE_URL", "test-dydx-grpc.kingnodes.com")
+DYDX_INDEXER_URL = os.environ.get("DYDX_INDEXER_URL", "https://indexer.v4testnet.dydx.exchange")
+DYDX_WEBSOCKET_URL = os.environ.get("DYDX_WEBSOCKET_URL", "wss://indexer.v4testnet.dydx.exchange/v4/ws")
+DYDX_NODE_INSECURE = os.environ.get("DYDX_NODE_INSECURE") == "1"
+
+CHAIN_NODES = {
+    "testnet": testnet_node,
+    "mainnet": mainnet_node
+}
+
+
+def split_urls(urls):
+    if isinstance(urls, str):
+        urls = urls.split(",")
+    return [url.strip() for url in urls if url.strip()]
+
+
+# Endpoints from the environment, overlaid with the SSM endpoint config when given:
+# {"network": "mainnet", "nodes": [...], "indexers": [...], "websocket": "wss://...", "insecure": false}
+def endpoint_config(config=None) -> dict:
+    config = config or {}
+    return {
+        "network": config.get("network", DYDX_NETWORK),
+        "nodes": split_urls(config.get("nodes", DYDX_NODE_URL)),
+        "indexers": split_urls(config.get("indexers", DYDX_INDEXER_URL)),
+        "websocket": config.get("websocket", DYDX_WEBSOCKET_URL),
+        "insecure": config.get("insecure", DYDX_NODE_INSECURE)
+    }
+
+
+def make_network(node_url, endpoints):
+    make = make_insecure if endpoints["insecure"] else make_secure
+    return make(
+        CHAIN_NODES[endpoints["network"]],
+        rest_indexer=endpoints["indexers"][0],
+        websocket_indexer=endpoints["websocket"],
+        node_url=node_url
+    )
+
+
+# Node errors worth retrying on another node
+def is_node_failure(error) -> bool:
+    if isinstance(error, grpc.RpcError):
+        return error.code() in NODE_FAILOVER_STATUS_CODES
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+# Indexer errors worth retrying on another indexer: transport errors,
+# rate limits and server errors. A 4xx is the request's own answer.
+def is_indexer_failure(error) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+class CallDetails(
+    namedtuple("CallDetails", ("method", "timeout", "metadata", "credentials", "wait_for_ready", "compression")),
+    grpc.ClientCallDetails
+):
+    pass
+
+
+# Give every node call without a timeout of its own a deadline; the SDK sets none
+class DeadlineInterceptor(grpc.UnaryUnaryClientInterceptor):
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        if client_call_details.timeout is None:
+            client_call_details = CallDetails(
+                client_call_details.method, self.timeout, client_call_details.metadata,
+                client_call_details.credentials, client_call_details.wait_for_ready,
+                client_call_details.compression
+            )
+        return continuation(client_call_details, request)
+
+
+# One node's client and channel
+class NodeConnection:
+
+    def __init__(self, url):
+        self.url = url
+        self.network = None
+        self.node = None
+        self.channel_state = None
+        self.last_used = 0.0
+
+    def _on_channel_state(self, state):
+        self.channel_state = state
+
+    def is_stale(self, max_idle) -> bool:
+        if self.node is None:
+            return True
+        if self.channel_state in STALE_CHANNEL_STATES:
+            return True
+        return time.monotonic() - self.last_used > max_idle
+
+    async def connect(self, network):
+        self.network = network
+        with metrics.phase("connect"):
+            self.node = await NodeClient.connect(self.network.node)
+        # Sequences are handed out by the local sequence manager, so skip the
+        # SDK's extra account query before every broadcast
+        self.node.sequence_manager = None
+        self.node.channel = grpc.intercept_channel(self.network.node.channel, DeadlineInterceptor(NODE_CALL_TIMEOUT))
+        self.channel_state = None
+        self.network.node.channel.subscribe(self._on_channel_state, try_to_connect=False)
+        self.last_used = time.monotonic()
+        return self.node
+
+    def close(self):
+        if self.network is not None:
+            try:
+                self.network.node.channel.unsubscribe(self._on_channel_state)
+                self.network.node.channel.close()
+            except Exception as e:
+                logger.warning(f"Failed to close node channel to {self.url}: {e}")
+        self.network = None
+        self.node = None
+        self.channel_state = None
+
+
+# Keep dYdX node, indexer and wallet clients alive across warm Lambda
+# invocations, spreading calls over every configured node and indexer
+class ConnectionManager:
+
+    def __init__(self, endpoints=None, make_network=make_network, max_idle=CHANNEL_MAX_IDLE_SECONDS):
+        self.make_network = make_network
+        self.max_idle = max_idle
+        self.nodes = {}
+        self.indexers = {}
+        self.http_session = None
+        self.http_loop = None
+        self.wallets = {}
+        self.counters = {
+            "node": {"hits": 0, "misses": 0},
+            "indexer": {"hits": 0, "misses": 0},
+            "wallet": {"hits": 0, "misses": 0},
+            "reconnects": 0
+        }
+        # Counts as of the last report()
+        self.reported = {}
+        self.configure(endpoints)
+
+    # Switch to another endpoint config, e.g. the one stored in SSM
+    def configure(self, endpoints=None):
+        self.endpoints = endpoint_config(endpoints)
+        if self.endpoints["network"] not in CHAIN_NODES:
+            raise ValueError(f"Unknown dYdX network {self.endpoints['network']!r}")
+        for connection in self.nodes.values():
+            connection.close()
+        self.nodes = {url: NodeConnection(url) for url in self.endpoints["nodes"]}
+        self.indexers = {}
+        self.node_pool = EndpointPool(self.endpoints["nodes"], is_node_failure)
+        self.indexer_pool = EndpointPool(self.endpoints["indexers"], is_indexer_failure)
+
+    @property
+    def websocket_url(self) -> str:
+        return self.endpoints["websocket"]
+
+    def _count(self, name, hit):
+        self.counters[name]["hits" if hit else "misses"] += 1
+
+    # The client for one node, or for the best scoring node
+    async def get_node(self, url: str = None) -> NodeClient:
+        connection = self.nodes[url or self.node_pool.best()]
+        if not connection.is_stale(self.max_idle):
+            self._count("node", True)
+            connection.last_used = time.monotonic()
+            return connection.node
+        self._count("node", False)
+        if connection.node is not None:
+            self.counters["reconnects"] += 1
+            connection.close()
+        return await connection.connect(self.make_network(connection.url, self.endpoints))
+
+    def close_node(self, url: str = None):
+        for connection in self.nodes.values() if url is None else [self.nodes[url]]:
+            connection.close()
+
+    # The client for one indexer, or for the best scoring indexer
+    async def get_indexer(self, url: str = None) -> IndexerClient:
+        url = url or self.indexer_pool.best()
+        loop = asyncio.get_running_loop()
+        # Pooled HTTP connections are bound to the event loop which opened them
+        if self.http_loop is not loop or loop.is_closed():
+            self.http_session = httpx.AsyncClient()
+            self.http_loop = loop
+            self.indexers = {}
+        indexer = self.indexers.get(url)
+        if indexer is not None:
+            self._count("indexer", True)
+            return indexer
+        self._count("indexer", False)
+        indexer = IndexerClient(url)
+        use_pooled_session(indexer, self.http_session)
+        self.indexers[url] = indexer
+        return indexer
+
+    # Sequences are owned by the sequence manager; with a known account number
+    # the wallet is derived locally without an account query
+    async def get_wallet(self, mnemonic: str, address: str, account_number: int = None) -> Wallet:
+        wallet = self.wallets.get(address)
+        if wallet is not None:
+            self._count("wallet", True)
+            return wallet
+        self._count("wallet", False)
+        if account_number is None:
+            wallet = await self.call_node(lambda node: Wallet.from_mnemonic(node, mnemonic, address), hedge=True)
+        else:
+            key = await asyncio.to_thread(KeyPair.from_mnemonic, mnemonic)
+            wallet = Wallet(key, account_number, 0)
+        self.wallets[address] = wallet
+        return wallet
+
+    # Run a node call on the healthiest node, failing over to the next when a
+    # node is down and rebuilding broken channels. Reads may pass hedge=True
+    # to race a second node once the first is unusually slow; broadcasts never do.
+    async def call_node(self, call, hedge=False):
+        async def attempt(url):
+            node = await self.get_node(url)
+            try:
+                return await run_blocking(call(node))
+            except grpc.RpcError as e:
+                if e.code() in RECONNECT_STATUS_CODES:
+                    logger.warning(f"Node channel to {url} broken ({e.code()}), reconnecting")
+                    self.close_node(url)
+                raise
+        return await self.node_pool.run(attempt, hedge)
+
+    # Broadcast a signed transaction with failover. A node may have taken the
+    # transaction before the timeout or dropped connection that failed the
+    # call over; the resend then comes back as already in the mempool cache,
+    # which means the first send went through, so it is reported as accepted.
+    async def broadcast(self, call):
+        sends = 0
+
+        def send(node):
+            nonlocal sends
+            sends += 1
+            return call(node)
+
+        transaction = await self.call_node(send)
+        tx_response = transaction.tx_response
+        if sends > 1 and tx_response.code == TX_IN_CACHE_CODE:
+            logger.warning(f"Resent transaction {tx_response.txhash} was already received: {tx_response.raw_log}")
+            tx_response.code = 0
+        return transaction
+
+    # Run an indexer read, hedged to a second indexer by default
+    async def call_indexer(self, call, hedge=True):
+        async def attempt(url):
+            return await call(await self.get_indexer(url))
+        return await self.indexer_pool.run(attempt, hedge)
+
+    def stats(self) -> dict:
+        return {
+            "node": dict(self.counters["node"]),
+            "indexer": dict(self.counters["indexer"]),
+            "wallet": dict(self.counters["wallet"]),
+            "reconnects": self.counters["reconnects"],
+            "node_pool": self.node_pool.snapshot(),
+            "indexer_pool": self.indexer_pool.snapshot()
+        }
+
+    # Reuse, reconnect, hedge and failover counters flattened for metrics
+    def counts(self) -> dict:
+        counts = {"reconnects": self.counters["reconnects"]}
+        for kind in ("node", "indexer", "wallet"):
+            for name, value in self.counters[kind].items():
+                counts[f"{kind}_{name}"] = value
+        for kind, pool in (("node", self.node_pool), ("indexer", self.indexer_pool)):
+            for name in ("hedges", "hedge_wins", "failovers"):
+                counts[f"{kind}_{name}"] = getattr(pool, name)
+        return counts
+
+    # Emit the counters' growth since the last report as one "connections"
+    # record; pools rebuilt by configure() start their counters over
+    def report(self):
+        counts = self.counts()
+        metrics.emit("connections", {
+            name: max(0, value - self.reported.get(name, 0)) for name, value in counts.items()
+        }, unit="Count")
+        self.reported = counts
+
+
+# The SDK's node methods are coroutines around blocking gRPC stubs; run them on
+# a worker thread so several node calls can be in flight at once. A dedicated
+# pool, as the default one is sized by CPU count (5 threads on a 1 vCPU
+# Lambda) and would queue the broadcasts of a signal fanned out to many accounts.
+node_call_executor = ThreadPoolExecutor(max_workers=NODE_CALL_THREADS, thread_name_prefix="node-call")
+
+
+async def run_blocking(coroutine):
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        node_call_executor, context.run, asyncio.run, coroutine
+    )
+
+
+# The SDK opens a new HTTP client for every indexer request; route all
+# indexer modules through one pooled session instead
+def use_pooled_session(indexer: IndexerClient, session: httpx.AsyncClient):
+    for module in (indexer.markets, indexer.account, indexer.utility):
+        async def get(request_path, params={}, module=module):
+            url = f"{module.host}{generate_query_path(request_path, params)}"
+            response = await session.get(url, timeout=module.api_timeout)
+            response.raise_for_status()
+            return response.json()
+        module.get = get
+
+
+connections = ConnectionManager()
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from http import HTTPStatus
+
+import boto3
+
+import bootstrap
+from signal_core import make_core
+
+logger = logging.getLogger(__name__)
+
+# Long-running alternative to the Lambda handler: signals arrive over HTTP
+# and/or a queue and are placed by a bounded pool of workers sharing one
+# event loop, so connections, market cache and sequence state stay hot.
+#
+#   SIGNAL_QUEUE=sqs:https://sqs.us-east-1.amazonaws.com/123/signals python daemon.py
+#   echo '{"order_side": "buy", ...}' | SIGNAL_QUEUE=stdin DAEMON_PORT= python daemon.py
+
+DAEMON_HOST = os.environ.get("DAEMON_HOST", "127.0.0.1")
+# Empty disables the HTTP endpoint
+DAEMON_PORT = os.environ.get("DAEMON_PORT", "8080")
+# "sqs:<queue url>", "stdin" (one JSON signal or batch per line) or empty
+SIGNAL_QUEUE = os.environ.get("SIGNAL_QUEUE", "")
+DAEMON_WORKERS = int(os.environ.get("DAEMON_WORKERS", 8))
+# Signals waiting for a worker; HTTP requests past this get 503
+DAEMON_QUEUE_SIZE = int(os.environ.get("DAEMON_QUEUE_SIZE", 256))
+# Longest shutdown waits for in-flight signals
+DAEMON_DRAIN_SECONDS = float(os.environ.get("DAEMON_DRAIN_SECONDS", 25))
+SQS_WAIT_SECONDS = 10
+MAX_BODY_BYTES = 1024 * 1024
+
+
+async def read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError(f"Request body of {length} bytes is too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def write_response(writer, status_code, body, keep_alive=True):
+    data = json.dumps(body).encode()
+    writer.write(
+        f"HTTP/1.1 {status_code} {HTTPStatus(status_code).phrase}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(data)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+    )
+
+
+# Feeds signals from every source into one bounded queue served by a worker pool
+class SignalDaemon:
+
+    def __init__(self, core, workers=DAEMON_WORKERS, queue_size=DAEMON_QUEUE_SIZE):
+        self.core = core
+        self.worker_count = workers
+        self.jobs = asyncio.Queue(queue_size)
+        self.workers = []
+        self.sources = []
+        self.acks = set()
+        self.server = None
+        self.stopping = False
+        self.handled = 0
+        self.failed = 0
+        self.rejected = 0
+
+    # Queue a decoded body without waiting; raises asyncio.QueueFull when saturated
+    def submit(self, body):
+        future = asyncio.get_running_loop().create_future()
+        self.jobs.put_nowait((body, future, time.perf_counter()))
+        return future
+
+    # Queue a decoded body, waiting for room (queue sources apply backpressure)
+    async def enqueue(self, body):
+        future = asyncio.get_running_loop().create_future()
+        await self.jobs.put((body, future, time.perf_counter()))
+        return future
+
+    async def _work(self):
+        while True:
+            body, future, received_at = await self.jobs.get()
+            try:
+                result = await self.core.handle(body, received_at)
+                self.handled += 1
+            except Exception as e:
+                logger.exception("Signal handling failed")
+                result = (500, {"error": str(e)})
+                self.failed += 1
+            self.jobs.task_done()
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.jobs.qsize(),
+            "handled": self.handled,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "stopping": self.stopping,
+            "execution": self.core.trading().scheduler.stats(),
+            "endpoints": self.core.trading().connections.stats()
+        }
+
+    async def route(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, self.stats()
+        if method != "POST":
+            return 404, {"error": "Not found"}
+        if self.stopping:
+            return 503, {"error": "Shutting down"}
+        try:
+            decoded = json.loads(body)
+        except ValueError as e:
+            return 400, {"error": f"Invalid JSON: {e}"}
+        try:
+            future = self.submit(decoded)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return 503, {"error": "Too many signals in flight"}
+        return await future
+
+    async def _serve_client(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status_code, response = await self.route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close" and not self.stopping
+                write_response(writer, status_code, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logger.debug(f"Dropping client connection: {e}")
+        finally:
+            writer.close()
+
+    async def _ack_sqs(self, client, queue_url, message, future):
+        status_code, _ = await future
+        # Server side failures stay on the queue and are redelivered
+        if status_code < 500:
+            await asyncio.to_thread(
+                client.delete_message, QueueUrl=queue_url, ReceiptHandle=message["ReceiptHandle"]
+            )
+
+    async def _poll_sqs(self, queue_url, region):
+        session = boto3.session.Session()
+        client = session.client(service_name="sqs", region_name=region)
+        while not self.stopping:
+            try:
+                response = await asyncio.to_thread(
+                    client.receive_message, QueueUrl=queue_url,
+                    MaxNumberOfMessages=10, WaitTimeSeconds=SQS_WAIT_SECONDS
+                )
+            except Exception as e:
+                logger.warning(f"SQS receive failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            for message in response.get("Messages", []):
+                try:
+                    body = json.loads(message["Body"])
+                except ValueError:
+                    body = message["Body"]
+                future = await self.enqueue(body)
+                ack = asyncio.ensure_future(self._ack_sqs(client, queue_url, message, future))
+                self.acks.add(ack)
+                ack.add_done_callback(self.acks.discard)
+
+    async def _read_stdin(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        while not self.stopping:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                body = json.loads(line)
+            except ValueError as e:
+                print(json.dumps({"status": 400, "body": {"error": f"Invalid JSON: {e}"}}), flush=True)
+                continue
+            future = await self.enqueue(body)
+            future.add_done_callback(
+                lambda done: print(json.dumps({"status": done.result()[0], "body": done.result()[1]}), flush=True)
+            )
+
+    async def start(self, host=DAEMON_HOST, port=DAEMON_PORT, queue=SIGNAL_QUEUE, region=None):
+        self.workers = [asyncio.ensure_future(self._work()) for _ in range(self.worker_count)]
+        if port:
+            self.server = await asyncio.start_server(self._serve_client, host, int(port))
+            logger.info(f"Listening on {host}:{self.server.sockets[0].getsockname()[1]}")
+        kind, _, target = queue.partition(":")
+        if kind == "sqs":
+            self.sources.append(asyncio.ensure_future(self._poll_sqs(target, region)))
+        elif kind == "stdin":
+            self.sources.append(asyncio.ensure_future(self._read_stdin()))
+
+    # Stop taking signals, let queued and in-flight ones finish, then stop the workers
+    async def shutdown(self, drain_seconds=DAEMON_DRAIN_SECONDS):
+        self.stopping = True
+        if self.server is not None:
+            self.server.close()
+        for source in self.sources:
+            source.cancel()
+        try:
+            await asyncio.wait_for(self.jobs.join(), drain_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.jobs.qsize()} signals still queued after {drain_seconds}s")
+        if self.acks:
+            await asyncio.wait(self.acks, timeout=drain_seconds)
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, *self.sources, return_exceptions=True)
+        await self.core.deduplicator.flush(drain_seconds)
+        await asyncio.to_thread(self.core.notifier.flush, drain_seconds)
+
+
+async def main():
+    secret_name = os.environ['SECRET_NAME']
+    message_name = os.environ['MESSAGE_NAME']
+    region_name = os.environ['REGION_NAME']
+    config = bootstrap.fetch_config(secret_name, message_name, region_name, os.environ.get('ENDPOINTS_SSM_NAME'))
+    dydx_secret, message_config = config.result()
+    endpoints = config.endpoints_result()
+    orders = bootstrap.load_module("orders", lambda orders: orders.configure(dydx_secret, region_name, endpoints))
+    core = make_core(lambda: orders, message_config, region_name)
+    with bootstrap.phase("prewarm"):
+        await orders.warm_up()
+    bootstrap.report()
+
+    daemon = SignalDaemon(core)
+    await daemon.start(region=region_name)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    # A stdin source that reaches end of input also stops the daemon
+    stopped = asyncio.ensure_future(stop.wait())
+    await asyncio.wait([stopped, *daemon.sources], return_when=asyncio.FIRST_COMPLETED)
+    stopped.cancel()
+    await daemon.shutdown()
+    print(json.dumps({"daemon": daemon.stats()}))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
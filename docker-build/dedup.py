@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+# Where handled signals are shared between containers: "dynamodb:<table>", "file:<path>" or "none".
+# Off by default: a file under /tmp is private to one Lambda container, so it
+# only adds disk I/O on top of the in-memory cache.
+DEDUP_STORE = os.environ.get("DEDUP_STORE", "none")
+# Optional endpoint for DynamoDB-compatible stores (e.g. DynamoDB Local)
+DEDUP_STORE_ENDPOINT = os.environ.get("DEDUP_STORE_ENDPOINT")
+# How long a handled signal is remembered
+DEDUP_TTL = float(os.environ.get("DEDUP_TTL", 3600))
+# Most signals remembered in memory per container
+DEDUP_MAX_ENTRIES = int(os.environ.get("DEDUP_MAX_ENTRIES", 4096))
+# A claim that never got a result is abandoned after this long (Lambda timeout is 29s)
+PENDING_TTL = 30
+
+
+# Identity of a signal: the same alert redelivered always maps to the same key
+def signal_fingerprint(signal) -> str:
+    parts = (
+        str(signal["order_strategy"]).strip(),
+        str(signal["signal_time"]).strip(),
+        str(signal["market_pair"]).strip().upper(),
+        str(signal["order_side"]).strip().lower(),
+        format(float(signal["order_size"]), ".12g")
+    )
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+# Bounded LRU of records {"result": ..., "expires": epoch seconds}; a None result is a pending claim
+class RecentSignals:
+
+    def __init__(self, max_entries=DEDUP_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.records = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            record = self.records.get(key)
+            if record is None:
+                return None
+            if record["expires"] <= time.time():
+                del self.records[key]
+                return None
+            self.records.move_to_end(key)
+            return record
+
+    def put(self, key, record):
+        with self.lock:
+            self.records[key] = record
+            self.records.move_to_end(key)
+            while len(self.records) > self.max_entries:
+                self.records.popitem(last=False)
+
+    def pop(self, key):
+        with self.lock:
+            self.records.pop(key, None)
+
+
+# Keep handled signals in a local JSON file
+class FileDedupStore:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write(self, records):
+        now = time.time()
+        records = {key: record for key, record in records.items() if record["expires"] > now}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(records, f)
+        os.replace(tmp_path, self.path)
+
+    # Return the live record for key, or record a pending claim and return None
+    def claim(self, key, expires):
+        with self.lock:
+            records = self._read()
+            record = records.get(key)
+            if record is not None and record["expires"] > time.time():
+                return record
+            records[key] = {"result": None, "expires": expires}
+            self._write(records)
+            return None
+
+    def complete(self, key, record):
+        with self.lock:
+            records = self._read()
+            records[key] = record
+            self._write(records)
+
+    def release(self, key):
+        with self.lock:
+            records = self._read()
+            if records.pop(key, None) is not None:
+                self._write(records)
+
+
+# Keep handled signals in a DynamoDB table keyed on "fingerprint"; "expires" can be the table TTL attribute
+class DynamoDBDedupStore:
+
+    def __init__(self, table_name, region=None, endpoint_url=None):
+        self.table_name = table_name
+        session = boto3.session.Session()
+        self.client = session.client(
+            service_name="dynamodb",
+            region_name=region,
+            endpoint_url=endpoint_url
+        )
+
+    def claim(self, key, expires):
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={"fingerprint": {"S": key}, "expires": {"N": str(int(expires))}},
+                ConditionExpression="attribute_not_exists(fingerprint) OR expires < :now",
+                ExpressionAttributeValues={":now": {"N": str(int(time.time()))}}
+            )
+            return None
+        except self.client.exceptions.ConditionalCheckFailedException:
+            pass
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={"fingerprint": {"S": key}},
+            ConsistentRead=True
+        )
+        item = response.get("Item")
+        if item is None:
+            # Released between the two calls, let the caller retry later
+            return {"result": None, "expires": expires}
+        return {
+            "result": json.loads(item["result"]["S"]) if "result" in item else None,
+            "expires": int(item["expires"]["N"])
+        }
+
+    def complete(self, key, record):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                "fingerprint": {"S": key},
+                "result": {"S": json.dumps(record["result"])},
+                "expires": {"N": str(int(record["expires"]))}
+            }
+        )
+
+    def release(self, key):
+        self.client.delete_item(
+            TableName=self.table_name,
+            Key={"fingerprint": {"S": key}}
+        )
+
+
+def make_dedup_store(spec=DEDUP_STORE, region=None):
+    kind, _, target = spec.partition(":")
+    if kind == "file":
+        return FileDedupStore(target)
+    if kind == "dynamodb":
+        return DynamoDBDedupStore(target, region, DEDUP_STORE_ENDPOINT)
+    return None
+
+
+# Remembers which signals were handled and what they returned. Warm hits are
+# answered from memory; the shared store catches redeliveries that land on
+# another container. Store I/O runs on worker threads so the event loop keeps
+# serving other orders meanwhile. Store failures fail open so a signal is never dropped.
+class SignalDeduplicator:
+
+    def __init__(self, store=None, ttl=DEDUP_TTL, max_entries=DEDUP_MAX_ENTRIES):
+        self.store = store
+        self.ttl = ttl
+        self.recent = RecentSignals(max_entries)
+        self.hits = 0
+        self.misses = 0
+        # Store updates still being written
+        self.writes = set()
+
+    # Return the earlier record for a duplicate, or claim the signal and return None
+    async def claim(self, key):
+        record = self.recent.get(key)
+        if record is None and self.store is not None:
+            try:
+                record = await asyncio.to_thread(self.store.claim, key, time.time() + PENDING_TTL)
+            except Exception as e:
+                logger.warning(f"Dedup store claim failed: {e}")
+            if record is not None and record["result"] is not None:
+                self.recent.put(key, record)
+        if record is not None:
+            self.hits += 1
+            return record
+        self.misses += 1
+        self.recent.put(key, {"result": None, "expires": time.time() + PENDING_TTL})
+        return None
+
+    # Remember the result returned for a claimed signal. The store is written
+    # in the background so the response doesn't wait on it; see flush().
+    def complete(self, key, result):
+        record = {"result": result, "expires": time.time() + self.ttl}
+        self.recent.put(key, record)
+        if self.store is not None:
+            task = asyncio.ensure_future(self._write(self.store.complete, key, record))
+            self.writes.add(task)
+            task.add_done_callback(self.writes.discard)
+
+    # Forget a claim whose handling failed so a redelivery can retry it
+    async def release(self, key):
+        self.recent.pop(key)
+        if self.store is not None:
+            await self._write(self.store.release, key)
+
+    async def _write(self, update, *args):
+        try:
+            await asyncio.to_thread(update, *args)
+        except Exception as e:
+            logger.warning(f"Dedup store {update.__name__} failed: {e}")
+
+    # Wait for background store writes, e.g. before the Lambda container freezes
+    async def flush(self, timeout=None):
+        if self.writes:
+            await asyncio.wait(list(self.writes), timeout=timeout)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Percentile of an endpoint's recent latencies after which a read is hedged to the next endpoint
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", "90"))
+# Bounds on the hedge delay, so a fast endpoint is not hedged on jitter and a slow one is not waited on forever
+HEDGE_MIN_SECONDS = float(os.environ.get("HEDGE_MIN_MS", "25")) / 1000
+HEDGE_MAX_SECONDS = float(os.environ.get("HEDGE_MAX_MS", "1000")) / 1000
+# Weight of the newest sample in the rolling latency and error scores
+SCORE_DECAY = 0.2
+# Latency samples kept per endpoint for the hedge percentile
+LATENCY_SAMPLES = 50
+# A failing endpoint's score is its latency scaled up by this much per unit of error rate
+ERROR_PENALTY = 10.0
+# Consecutive failures after which an endpoint sits out until the cooldown passes
+FAILURE_THRESHOLD = 3
+COOLDOWN_SECONDS = 10.0
+# Assumed latency of an endpoint with no samples yet, so unknown endpoints keep their configured order
+DEFAULT_LATENCY = 0.1
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+# Rolling latency and error score of one endpoint
+class EndpointStats:
+
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, seconds: float, ok: bool):
+        self.calls += 1
+        self.samples.append(seconds)
+        self.latency = seconds if self.latency is None else self.latency + SCORE_DECAY * (seconds - self.latency)
+        self.error_rate += SCORE_DECAY * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.failures = 0
+            return
+        self.errors += 1
+        self.failures += 1
+        if self.failures >= FAILURE_THRESHOLD:
+            self.cooldown_until = time.monotonic() + COOLDOWN_SECONDS
+
+    def cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    # Lower is better; endpoints cooling down sort after every healthy one
+    def score(self) -> float:
+        latency = DEFAULT_LATENCY if self.latency is None else self.latency
+        return latency * (1 + ERROR_PENALTY * self.error_rate)
+
+    def hedge_delay(self) -> float:
+        if not self.samples:
+            return HEDGE_MAX_SECONDS
+        return min(HEDGE_MAX_SECONDS, max(HEDGE_MIN_SECONDS, percentile(self.samples, HEDGE_PERCENTILE)))
+
+    def snapshot(self) -> dict:
+        return {
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 3),
+            "error_rate": round(self.error_rate, 4),
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 3),
+            "calls": self.calls,
+            "errors": self.errors,
+            "cooling_down": self.cooling_down()
+        }
+
+
+# Route calls to the best scoring endpoint, failing over to the next on
+# endpoint errors and optionally hedging slow reads to a second endpoint.
+# is_failure(error) says whether an error is the endpoint's fault; any other
+# error is the call's own answer and is raised without trying elsewhere.
+class EndpointPool:
+
+    def __init__(self, endpoints, is_failure):
+        if not endpoints:
+            raise ValueError("Endpoint pool needs at least one endpoint")
+        self.endpoints = list(dict.fromkeys(endpoints))
+        self.is_failure = is_failure
+        self.stats = {endpoint: EndpointStats() for endpoint in self.endpoints}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    # Best first; configured order breaks ties
+    def ranked(self) -> list:
+        return sorted(
+            self.endpoints,
+            key=lambda endpoint: (self.stats[endpoint].cooling_down(), self.stats[endpoint].score())
+        )
+
+    def best(self):
+        return self.ranked()[0]
+
+    async def _timed(self, endpoint, call):
+        stats = self.stats[endpoint]
+        started = time.monotonic()
+        try:
+            result = await call(endpoint)
+        except asyncio.CancelledError:
+            # A hedge loser took at least this long
+            stats.record(time.monotonic() - started, True)
+            raise
+        except BaseException as e:
+            stats.record(time.monotonic() - started, not self.is_failure(e))
+            raise
+        stats.record(time.monotonic() - started, True)
+        return result
+
+    # Await call(endpoint) on the best endpoint. Endpoint failures move on to
+    # the next endpoint; a lone endpoint gets a single retry. With hedge, a
+    # duplicate goes to the next endpoint once the first is slower than its
+    # usual percentile, and whichever answers first wins.
+    async def run(self, call, hedge=False):
+        ranked = self.ranked()
+        attempts = ranked if len(ranked) > 1 else ranked * 2
+        pending = {}
+        launched = []
+        hedged = set()
+        last_error = None
+
+        def launch():
+            endpoint = attempts[len(launched)]
+            launched.append(endpoint)
+            pending[asyncio.ensure_future(self._timed(endpoint, call))] = endpoint
+
+        launch()
+        hedging = hedge and len(ranked) > 1
+        try:
+            while pending:
+                can_hedge = hedging and len(pending) == 1 and len(launched) < len(attempts)
+                delay = self.stats[launched[-1]].hedge_delay() if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedges += 1
+                    launch()
+                    hedged.add(launched[-1])
+                    continue
+                for task in done:
+                    endpoint = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if endpoint in hedged:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if not self.is_failure(error):
+                        raise error
+                    last_error = error
+                    logger.warning(f"Endpoint {endpoint} failed: {error!r}")
+                if not pending and len(launched) < len(attempts):
+                    self.failovers += 1
+                    launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self) -> dict:
+        return {
+            "endpoints": {endpoint: stats.snapshot() for endpoint, stats in self.stats.items()},
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers
+        }
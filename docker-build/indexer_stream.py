@@ -0,0 +1,71 @@
+import logging
+import ssl
+import threading
+import time
+
+from dydx_v4_client.indexer.socket.websocket import IndexerSocket
+
+logger = logging.getLogger(__name__)
+
+# A stream silent for longer than this (no data or pong) is treated as dead,
+# e.g. after the Lambda container was frozen
+WS_STALE_SECONDS = 45
+WS_PING_INTERVAL = 20
+WS_PING_TIMEOUT = 10
+WS_RECONNECT_SECONDS = 5
+
+
+# One indexer websocket on a daemon thread, kept open with pings and
+# reconnects. on_open(ws) subscribes, also after every reconnect, and
+# on_message(ws, message) handles each message.
+class IndexerStream:
+
+    def __init__(self, name, on_open, on_message):
+        self.name = name
+        self.on_open = on_open
+        self.on_message = on_message
+        self.socket = None
+        self.connected = False
+        self.last_activity = 0.0
+
+    def _on_open(self, ws):
+        self.connected = True
+        self.last_activity = time.monotonic()
+        self.on_open(ws)
+
+    def _on_message(self, ws, message):
+        self.last_activity = time.monotonic()
+        self.on_message(ws, message)
+
+    def _on_pong(self, ws, data):
+        self.last_activity = time.monotonic()
+
+    def _on_close(self, ws, status_code, reason):
+        self.connected = False
+
+    def _on_error(self, ws, error):
+        logger.warning(f"{self.name} stream error: {error}")
+
+    def _run(self):
+        self.socket.run_forever(
+            sslopt={"cert_reqs": ssl.CERT_REQUIRED},
+            ping_interval=WS_PING_INTERVAL,
+            ping_timeout=WS_PING_TIMEOUT,
+            reconnect=WS_RECONNECT_SECONDS
+        )
+
+    def start(self, websocket_url):
+        if self.socket is not None:
+            return
+        self.socket = IndexerSocket(
+            websocket_url,
+            on_open=self._on_open,
+            on_message=self._on_message,
+            on_close=self._on_close,
+            on_error=self._on_error,
+            on_pong=self._on_pong
+        )
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def is_live(self) -> bool:
+        return self.connected and time.monotonic() - self.last_activity < WS_STALE_SECONDS
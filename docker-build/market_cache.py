@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import os
+import time
+
+from dydx_v4_client.node.market import Market
+
+from connection import connections
+
+logger = logging.getLogger(__name__)
+
+# Seconds before cached market metadata is refreshed in the background
+MARKET_CACHE_TTL = float(os.environ.get("MARKET_CACHE_TTL", 300))
+# Order rejections which mean the cached tick/step sizes are out of date
+STALE_MARKET_ERRORS = ("quantums", "subticks")
+
+
+# Perpetual market metadata (tick size, step size, atomic resolution) by pair
+class MarketCache:
+
+    def __init__(self, connections, ttl=MARKET_CACHE_TTL):
+        self.connections = connections
+        self.ttl = ttl
+        self.markets = {}
+        self.fetched_at = {}
+        self.refresh_task = None
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, markets: dict):
+        now = time.monotonic()
+        for pair, market in markets.items():
+            self.markets[pair] = Market(market)
+            self.fetched_at[pair] = now
+
+    # Load every perpetual market in one request
+    async def prefetch(self):
+        response = await self.connections.call_indexer(lambda indexer: indexer.markets.get_perpetual_markets())
+        self._store(response["markets"])
+
+    async def _refresh(self):
+        try:
+            await self.prefetch()
+        except Exception as e:
+            logger.warning(f"Market cache refresh failed: {e}")
+        finally:
+            self.refresh_task = None
+
+    def refresh_in_background(self):
+        if self.refresh_task is None:
+            self.refresh_task = asyncio.ensure_future(self._refresh())
+
+    async def get(self, market_pair: str) -> Market:
+        market = self.markets.get(market_pair)
+        if market is not None:
+            self.hits += 1
+            # Serve the cached copy, an expired entry never blocks an order
+            if time.monotonic() - self.fetched_at[market_pair] > self.ttl:
+                self.refresh_in_background()
+            return market
+        self.misses += 1
+        response = await self.connections.call_indexer(
+            lambda indexer: indexer.markets.get_perpetual_markets(market_pair)
+        )
+        self._store(response["markets"])
+        return self.markets[market_pair]
+
+    # Current oracle price, always read from the indexer: cached metadata
+    # may be served long past its TTL and is never priced from
+    async def oracle_price(self, market_pair: str) -> float:
+        response = await self.connections.call_indexer(
+            lambda indexer: indexer.markets.get_perpetual_markets(market_pair)
+        )
+        self._store(response["markets"])
+        return float(response["markets"][market_pair]["oraclePrice"])
+
+    def invalidate(self, market_pair: str = None):
+        if market_pair is None:
+            self.markets.clear()
+            self.fetched_at.clear()
+        else:
+            self.markets.pop(market_pair, None)
+            self.fetched_at.pop(market_pair, None)
+
+    # Drop the pair when the chain rejected an order built from its metadata
+    def check_rejection(self, market_pair: str, transaction):
+        tx_response = getattr(transaction, "tx_response", None)
+        if tx_response is None or not tx_response.code:
+            return
+        raw_log = tx_response.raw_log.lower()
+        if any(error in raw_log for error in STALE_MARKET_ERRORS):
+            logger.warning(f"Order rejected for {market_pair}, invalidating market metadata: {tx_response.raw_log}")
+            self.invalidate(market_pair)
+
+
+market_cache = MarketCache(connections)
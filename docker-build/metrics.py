@@ -0,0 +1,108 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# CloudWatch namespace and service dimension of every record
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "AutoTradingBot")
+METRICS_SERVICE = os.environ.get("METRICS_SERVICE", "trading")
+# Print CloudWatch Embedded Metric Format records to stdout, where Lambda picks them up
+METRICS_EMF = os.environ.get("METRICS_EMF", "1") == "1"
+# Optional JSON lines file receiving the same records, for local runs
+METRICS_SINK = os.environ.get("METRICS_SINK")
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+sink_lock = threading.Lock()
+
+
+# Phase durations of one order, from signal receipt to broadcast
+class Trace:
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases = {}
+        self.marks = {}
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds * 1000
+
+    # Milliseconds from the start of the trace until now
+    def mark(self, name):
+        self.marks[name] = (time.perf_counter() - self.started) * 1000
+
+    def dominant_phase(self):
+        if not self.phases:
+            return None
+        return max(self.phases, key=self.phases.get)
+
+
+# Time a block into the current trace; a no-op outside of one
+class phase:
+    __slots__ = ("name", "trace", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.trace = current_trace.get()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def mark(name):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.mark(name)
+
+
+# Collect phases of everything awaited inside, including tasks it starts
+@contextmanager
+def trace(started=None):
+    active = Trace(started)
+    token = current_trace.set(active)
+    try:
+        yield active
+    finally:
+        current_trace.reset(token)
+
+
+# Write one record of metrics, milliseconds unless unit says otherwise, to stdout (EMF) and/or the local sink
+def emit(event, values, properties=None, unit="Milliseconds"):
+    if not METRICS_EMF and not METRICS_SINK:
+        return
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [["Service", "Event"]],
+                "Metrics": [{"Name": name, "Unit": unit} for name in values]
+            }]
+        },
+        "Service": METRICS_SERVICE,
+        "Event": event
+    }
+    record.update(properties or {})
+    record.update({name: round(value, 3) for name, value in values.items()})
+    line = json.dumps(record)
+    if METRICS_EMF:
+        print(line)
+    if METRICS_SINK:
+        with sink_lock, open(METRICS_SINK, "a") as f:
+            f.write(line + "\n")
+
+
+# Emit an order's phases tagged with signal-to-broadcast latency and the phase that dominated
+def emit_trace(event, active, properties=None):
+    values = dict(active.phases)
+    values["total"] = (time.perf_counter() - active.started) * 1000
+    if "broadcast" in active.marks:
+        values["signal_to_broadcast"] = active.marks["broadcast"]
+    emit(event, values, dict(properties or {}, dominant_phase=active.dominant_phase()))
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from connection import connections
+from indexer_stream import IndexerStream
+
+logger = logging.getLogger(__name__)
+
+# Stream order books from the indexer websocket; REST snapshots only are used when off
+ORDER_BOOK_WEBSOCKET = os.environ.get("ORDER_BOOK_WEBSOCKET", "1") == "1"
+# Markets whose books are subscribed at warm-up, comma separated; others on their first order
+ORDER_BOOK_MARKETS = os.environ.get("ORDER_BOOK_MARKETS", "")
+# Without a live stream, a REST snapshot is trusted for this long
+ORDER_BOOK_MAX_AGE = float(os.environ.get("ORDER_BOOK_MAX_AGE", 2))
+
+
+# One side of an L2 book as parallel arrays sorted by ascending price
+class BookSide:
+    __slots__ = ("prices", "sizes", "descending")
+
+    def __init__(self, descending):
+        # Bids are walked from the highest price, asks from the lowest
+        self.descending = descending
+        self.prices = []
+        self.sizes = []
+
+    def replace(self, levels):
+        levels = sorted((price, size) for price, size in levels if size > 0)
+        self.prices = [price for price, _ in levels]
+        self.sizes = [size for _, size in levels]
+
+    # Set a level's size; zero removes it
+    def update(self, price, size):
+        i = bisect_left(self.prices, price)
+        if i < len(self.prices) and self.prices[i] == price:
+            if size > 0:
+                self.sizes[i] = size
+            else:
+                del self.prices[i]
+                del self.sizes[i]
+        elif size > 0:
+            self.prices.insert(i, price)
+            self.sizes.insert(i, size)
+
+    def best(self):
+        if not self.prices:
+            return None
+        return self.prices[-1] if self.descending else self.prices[0]
+
+    # Price of the last level needed to fill size, or None when the book is too thin
+    def walk(self, size):
+        remaining = size
+        indices = range(len(self.prices) - 1, -1, -1) if self.descending else range(len(self.prices))
+        for i in indices:
+            remaining -= self.sizes[i]
+            if remaining <= 0:
+                return self.prices[i]
+        return None
+
+    def depth(self, levels):
+        if self.descending:
+            return list(zip(reversed(self.prices[-levels:]), reversed(self.sizes[-levels:])))
+        return list(zip(self.prices[:levels], self.sizes[:levels]))
+
+
+def parse_levels(levels):
+    # Snapshots carry {"price", "size"} objects, deltas [price, size] pairs
+    for level in levels or []:
+        if isinstance(level, dict):
+            yield float(level["price"]), float(level["size"])
+        else:
+            yield float(level[0]), float(level[1])
+
+
+# L2 order book of one market
+class OrderBook:
+
+    def __init__(self, market_pair, is_fresh=lambda book: book.source is not None):
+        self.market_pair = market_pair
+        # Whether the book may be priced from, given its source and age
+        self.is_fresh = is_fresh
+        self.lock = threading.Lock()
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        # "websocket" once the stream's snapshot arrived, "rest" for a REST snapshot, None until seeded
+        self.source = None
+        self.seeded_at = 0.0
+        self.updated_at = 0.0
+        self.updates = 0
+        self.snapshots = 0
+
+    def apply_snapshot(self, contents, source):
+        with self.lock:
+            self.bids.replace(parse_levels(contents.get("bids")))
+            self.asks.replace(parse_levels(contents.get("asks")))
+            self.source = source
+            self.seeded_at = self.updated_at = time.monotonic()
+            self.snapshots += 1
+
+    def apply_update(self, contents):
+        with self.lock:
+            for price, size in parse_levels(contents.get("bids")):
+                self.bids.update(price, size)
+            for price, size in parse_levels(contents.get("asks")):
+                self.asks.update(price, size)
+            self.updated_at = time.monotonic()
+            self.updates += 1
+
+    # Drop the stream's state until a fresh snapshot arrives
+    def invalidate(self):
+        with self.lock:
+            if self.source == "websocket":
+                self.bids.replace([])
+                self.asks.replace([])
+                self.source = None
+
+    # Best price an order on this side trades against, and the price of the
+    # level the book must be walked to for its size (None when too thin).
+    # A stale book gives no quote rather than old prices.
+    def quote(self, side: str, size: float):
+        if not self.is_fresh(self):
+            return None, None
+        book_side = self.asks if side == "buy" else self.bids
+        with self.lock:
+            return book_side.best(), book_side.walk(size)
+
+    def snapshot(self, levels=5) -> dict:
+        with self.lock:
+            return {
+                "bids": self.bids.depth(levels),
+                "asks": self.asks.depth(levels),
+                "source": self.source,
+                "updates": self.updates,
+                "snapshots": self.snapshots
+            }
+
+
+# Order books of every traded market, fed by one indexer websocket. Each
+# message on a connection carries the next message_id; a gap means deltas
+# were lost, so every book is resubscribed for a fresh snapshot.
+class OrderBooks:
+
+    def __init__(self, connections, websocket_url=None, use_websocket=ORDER_BOOK_WEBSOCKET):
+        self.connections = connections
+        self.websocket_url = websocket_url
+        self.use_websocket = use_websocket
+        self.books = {}
+        self.stream = IndexerStream("Order book", self.on_open, self.on_message)
+        self.last_message_id = None
+        self.seed_tasks = {}
+        self.gaps = 0
+        self.rest_seeds = 0
+
+    def book(self, market_pair) -> OrderBook:
+        book = self.books.get(market_pair)
+        if book is None:
+            book = self.books[market_pair] = OrderBook(market_pair, self.is_fresh)
+            if self.stream.connected:
+                self.stream.socket.order_book.subscribe(market_pair, batched=False)
+        return book
+
+    def resubscribe(self, ws, market_pair):
+        self.books[market_pair].invalidate()
+        ws.order_book.unsubscribe(market_pair)
+        ws.order_book.subscribe(market_pair, batched=False)
+
+    def on_open(self, ws):
+        self.last_message_id = None
+        for market_pair, book in list(self.books.items()):
+            book.invalidate()
+            ws.order_book.subscribe(market_pair, batched=False)
+
+    def on_message(self, ws, message):
+        message_id = message.get("message_id")
+        if message_id is not None:
+            if self.last_message_id is not None and message_id != self.last_message_id + 1:
+                self.gaps += 1
+                logger.warning(f"Order book stream skipped from message {self.last_message_id} to {message_id}, resnapshotting")
+                self.last_message_id = message_id
+                for market_pair in list(self.books):
+                    self.resubscribe(ws, market_pair)
+                return
+            self.last_message_id = message_id
+        book = self.books.get(message.get("id"))
+        try:
+            if message.get("type") == "subscribed" and book is not None:
+                book.apply_snapshot(message["contents"], "websocket")
+            elif message.get("type") == "channel_data" and book is not None and book.source == "websocket":
+                book.apply_update(message["contents"])
+            elif message.get("type") == "channel_batch_data" and book is not None and book.source == "websocket":
+                for contents in message["contents"]:
+                    book.apply_update(contents)
+            elif message.get("type") == "error":
+                logger.warning(f"Order book stream error: {message.get('message')}")
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Order book update for {message.get('id')} malformed, resnapshotting: {e}")
+            self.resubscribe(ws, book.market_pair)
+
+    def start_stream(self):
+        if self.use_websocket:
+            # Defaults to the configured endpoints' websocket
+            self.stream.start(self.websocket_url or self.connections.websocket_url)
+
+    def is_live(self) -> bool:
+        return self.stream.is_live()
+
+    def is_fresh(self, book) -> bool:
+        if book.source == "websocket":
+            return self.is_live()
+        return book.source == "rest" and time.monotonic() - book.seeded_at < ORDER_BOOK_MAX_AGE
+
+    async def seed(self, market_pair):
+        response = await self.connections.call_indexer(
+            lambda indexer: indexer.markets.get_perpetual_market_orderbook(market_pair)
+        )
+        book = self.books[market_pair]
+        # A stream snapshot that arrived meanwhile is newer
+        if book.source != "websocket" or not self.is_live():
+            book.apply_snapshot(response, "rest")
+        self.rest_seeds += 1
+
+    # Concurrent callers share one REST request per market
+    async def _seed_once(self, market_pair):
+        task = self.seed_tasks.get(market_pair)
+        if task is None:
+            task = self.seed_tasks[market_pair] = asyncio.ensure_future(self.seed(market_pair))
+        try:
+            await task
+        finally:
+            if self.seed_tasks.get(market_pair) is task:
+                del self.seed_tasks[market_pair]
+
+    # The market's book from memory, seeded over REST only until the stream's
+    # snapshot arrives or when the stream is down. A failed seed is logged and
+    # the book returned as is: an order never waits on the book.
+    async def get(self, market_pair: str) -> OrderBook:
+        self.start_stream()
+        book = self.book(market_pair)
+        if not self.is_fresh(book):
+            if book.source == "websocket" and self.stream.connected:
+                # The stream went quiet, e.g. while the container was frozen
+                self.resubscribe(self.stream.socket, market_pair)
+            try:
+                await self._seed_once(market_pair)
+            except Exception as e:
+                logger.warning(f"Order book snapshot for {market_pair} failed: {e}")
+        return book
+
+    async def prefetch(self, market_pairs=None):
+        if market_pairs is None:
+            market_pairs = [pair.strip() for pair in ORDER_BOOK_MARKETS.split(",") if pair.strip()]
+        await asyncio.gather(*(self.get(market_pair) for market_pair in market_pairs))
+
+    def stats(self) -> dict:
+        return {
+            "live": self.is_live(),
+            "gaps": self.gaps,
+            "rest_seeds": self.rest_seeds,
+            "books": {market_pair: book.snapshot(1) for market_pair, book in self.books.items()}
+        }
+
+
+order_books = OrderBooks(connections)
@@ -0,0 +1,256 @@
+import asyncio
+import random
+import logging
+import time
+from dataclasses import replace
+
+from dydx_v4_client import MAX_CLIENT_ID, OrderFlags
+from v4_proto.dydxprotocol.clob.order_pb2 import Order
+from dydx_v4_client.indexer.rest.constants import OrderType
+
+import metrics
+from accounts import load_accounts
+from block_height import block_tracker
+from connection import connections
+from market_cache import market_cache
+from order_book import order_books
+from risk import FREE_COLLATERAL_MIN, has_free_collateral, limit_price
+from scheduler import scheduler
+from slicing import SLICING_DEADLINE_SECONDS, SlicedOrder, policy_for
+from subaccount_state import initial_margin_fraction
+
+logger = logging.getLogger(__name__)
+
+# Trading accounts, set from the bot secret by configure()
+accounts = []
+
+def configure(dydx_secret, region_name, endpoints=None):
+    global accounts
+    if endpoints is not None:
+        connections.configure(endpoints)
+    accounts = load_accounts(dydx_secret, region_name)
+
+# Warm the market metadata cache, block height, order books and every
+# account's sequence and subaccount state so the first order skips those lookups
+async def warm_up():
+    for warmup in await asyncio.gather(
+        market_cache.prefetch(), block_tracker.sync(), order_books.prefetch(),
+        *(account.sequences.ready() for account in accounts),
+        *(account.subaccount.get() for account in accounts),
+        return_exceptions=True
+    ):
+        if isinstance(warmup, Exception):
+            logger.warning(f"Cold start warmup failed: {warmup}")
+
+# Sign with a private copy so concurrent orders never share a sequence
+async def broadcast_order(account, wallet, order):
+    signing_wallet = replace(wallet, sequence=await account.sequences.next())
+    with metrics.phase("broadcast"):
+        transaction = await connections.broadcast(
+            lambda node: node.place_order(wallet=signing_wallet, order=order)
+        )
+    metrics.mark("broadcast")
+    return transaction
+
+async def timed(name, awaitable):
+    with metrics.phase(name):
+        return await awaitable
+
+# Initial margin the order will lock up, priced at the oracle price
+def required_margin(market, market_pair: str, order_size: float) -> float:
+    return order_size * float(market.market.get("oraclePrice", 0)) * initial_margin_fraction(market_pair)
+
+# Slippage-bounded limit price for the order's size from the in-memory book,
+# around a freshly fetched oracle price while the book is stale or has no
+# levels on that side
+async def order_price(book, market_pair: str, side: str, order_size: float) -> float:
+    best, walked = book.quote(side, order_size)
+    if best is None:
+        return limit_price(side, await market_cache.oracle_price(market_pair))
+    return limit_price(side, best, walked)
+
+async def place_market_order(account, market_pair: str, side: str, order_size: float, client_id: int = None):
+    # None of the pre-trade reads depend on each other, fetch them in one wave
+    subaccount, market, book, good_til_block, wallet = await asyncio.gather(
+        timed("subaccount", account.subaccount.get()),
+        timed("market_fetch", market_cache.get(market_pair)),
+        timed("order_book", order_books.get(market_pair)),
+        timed("block_height", block_tracker.good_til_block()),
+        timed("wallet_load", account.load_wallet())
+    )
+    # Collateral already reserved by in-flight orders is not available
+    free_collateral = subaccount.available()
+    if not has_free_collateral(free_collateral, account.free_collateral_min):
+        logger.info(f"Free Collateral of {account.name}: {free_collateral} is lower than FREE_COLLATERAL_MIN: {account.free_collateral_min}")
+        print(f"Free Collateral of {account.name}: {free_collateral} is lower than FREE_COLLATERAL_MIN: {account.free_collateral_min}")
+        return None
+    if client_id is None:
+        client_id = random.randint(0, MAX_CLIENT_ID)
+    order_id = market.order_id(
+        account.address, account.subaccount_number, client_id, OrderFlags.SHORT_TERM
+    )
+    order_side = Order.Side.SIDE_SELL if side == "sell" else Order.Side.SIDE_BUY
+    with metrics.phase("pricing"):
+        price = await order_price(book, market_pair, side, order_size)
+    new_order = market.order(
+        order_id=order_id,
+        order_type=OrderType.MARKET,
+        side=order_side,
+        size=order_size,
+        price=price,
+        time_in_force=Order.TimeInForce.TIME_IN_FORCE_UNSPECIFIED,
+        reduce_only=False,
+        good_til_block=good_til_block,
+    )
+    # Hold the margin until the order is filled, cancelled or expires
+    subaccount.reserve(client_id, required_margin(market, market_pair, order_size))
+    try:
+        transaction = await broadcast_order(account, wallet, new_order)
+        if account.sequences.check_mismatch(transaction):
+            await account.sequences.ready()
+            transaction = await broadcast_order(account, wallet, new_order)
+    except BaseException:
+        subaccount.release(client_id)
+        raise
+    tx_response = transaction.tx_response
+    if tx_response.code:
+        subaccount.release(client_id)
+        logger.warning(f"Order {client_id} for {account.name} on {market_pair} rejected: {tx_response.raw_log}")
+    else:
+        logger.info(f"Order {client_id} for {account.name} on {market_pair} broadcast: {tx_response.txhash}")
+    market_cache.check_rejection(market_pair, transaction)
+    block_tracker.check_rejection(transaction)
+    await account.sequences.flush()
+    return transaction
+
+# Cancel a short-term order placed by place_market_order
+async def cancel_order(account, market_pair: str, client_id: int):
+    market, good_til_block, wallet = await asyncio.gather(
+        market_cache.get(market_pair), block_tracker.good_til_block(), account.load_wallet()
+    )
+    order_id = market.order_id(account.address, account.subaccount_number, client_id, OrderFlags.SHORT_TERM)
+    signing_wallet = replace(wallet, sequence=await account.sequences.next())
+    transaction = await connections.broadcast(
+        lambda node: node.cancel_order(wallet=signing_wallet, order_id=order_id, good_til_block=good_til_block)
+    )
+    account.subaccount.release(client_id)
+    await account.sequences.flush()
+    return transaction
+
+# Run a sliced order's broadcast under one of the scheduler's global slots
+async def in_slot(awaitable):
+    async with scheduler.slot():
+        return await awaitable
+
+# Split the order into child orders by the strategy's slicing policy, done
+# by deadline (a perf_counter() time)
+async def execute_sliced_order(account, market_pair: str, side: str, order_size: float, policy, deadline: float):
+    market, subaccount = await asyncio.gather(market_cache.get(market_pair), account.subaccount.get())
+    sliced = SlicedOrder(
+        policy, order_size,
+        step=float(market.market.get("stepSize", order_size)),
+        block_interval=block_tracker.block_interval,
+        subaccount=subaccount,
+        place=lambda size, client_id: in_slot(place_market_order(account, market_pair, side, size, client_id)),
+        cancel=lambda client_id: in_slot(cancel_order(account, market_pair, client_id)),
+        new_client_id=lambda: random.randint(0, MAX_CLIENT_ID),
+        deadline=deadline
+    )
+    return await sliced.run()
+
+# Place an order behind any earlier ones of the account for the same market,
+# e.g. a buy is always broadcast before the sell that closes it. received_at
+# is the perf_counter() time the signal arrived, the start of its latency
+# trace. Strategies with a slicing policy get their order split into child orders.
+async def execute_market_order(account, market_pair: str, side: str, order_size: float, received_at=None,
+                               order_strategy: str = None):
+    with metrics.trace(received_at) as trace:
+        submitted = time.perf_counter()
+        # Parsing, deduplication and lazy imports ahead of the order path
+        trace.add("intake", submitted - trace.started)
+
+        policy = policy_for(order_strategy)
+        sliced = policy.applies(order_size)
+
+        async def place():
+            trace.add("queue_wait", time.perf_counter() - submitted)
+            if sliced:
+                return await execute_sliced_order(
+                    account, market_pair, side, order_size, policy, trace.started + SLICING_DEADLINE_SECONDS
+                )
+            return await place_market_order(account, market_pair, side, order_size)
+
+        outcome = None
+        try:
+            # A sliced order keeps its market for its whole schedule but takes a
+            # global slot only while broadcasting, so other markets aren't starved
+            outcome = await scheduler.submit(account.lane(market_pair), place, hold_slot=not sliced)
+            return outcome
+        except BaseException as e:
+            outcome = e
+            raise
+        finally:
+            result = order_result(outcome, account.free_collateral_min)
+            metrics.emit_trace("order", trace, {
+                "account": account.name,
+                "market_pair": market_pair,
+                "order_side": side,
+                "status": result["status"],
+                "tx_hash": result.get("tx_hash")
+            })
+
+# Place one signal's order on every account trading its strategy, sized by
+# each account's multiplier. Accounts run concurrently over the shared
+# connections and caches, so N accounts take about as long as one; a failing
+# account doesn't stop the others. Returns [(account, outcome)].
+async def execute_signal(market_pair: str, side: str, order_size: float, received_at=None,
+                         order_strategy: str = None):
+    targets = [account for account in accounts if account.trades(order_strategy)]
+    outcomes = await asyncio.gather(*(
+        execute_market_order(
+            account, market_pair, side, account.order_size(order_size), received_at, order_strategy
+        )
+        for account in targets
+    ), return_exceptions=True)
+    return list(zip(targets, outcomes))
+
+# Place a batch of signals, markets and accounts in parallel and each
+# account's market in order; one failing order doesn't abort the others
+async def place_market_orders(signals, received_at=None):
+    return await asyncio.gather(*(
+        execute_signal(
+            signal["market_pair"], signal["order_side"], signal["order_size"], received_at, signal["order_strategy"]
+        )
+        for signal in signals
+    ), return_exceptions=True)
+
+# Summarise the outcome of place_market_order for the webhook response
+def order_result(outcome, free_collateral_min=FREE_COLLATERAL_MIN):
+    if isinstance(outcome, BaseException):
+        return {"status": "error", "error": str(outcome)}
+    if isinstance(outcome, SlicedOrder):
+        return outcome.result()
+    if outcome is None:
+        return {"status": "skipped", "error": f"Free collateral is not above FREE_COLLATERAL_MIN: {free_collateral_min}"}
+    tx_response = outcome.tx_response
+    if tx_response.code:
+        return {"status": "rejected", "tx_hash": tx_response.txhash, "error": tx_response.raw_log}
+    return {"status": "placed", "tx_hash": tx_response.txhash}
+
+# Summarise execute_signal: a single account's result as is, several
+# accounts' results side by side under an overall status
+def signal_result(results):
+    if isinstance(results, BaseException):
+        return order_result(results)
+    if not results:
+        return {"status": "skipped", "error": "No account trades this strategy", "accounts": []}
+    if len(results) == 1:
+        account, outcome = results[0]
+        return order_result(outcome, account.free_collateral_min)
+    per_account = [
+        dict(order_result(outcome, account.free_collateral_min), account=account.name,
+             size_multiplier=account.size_multiplier)
+        for account, outcome in results
+    ]
+    statuses = {result["status"] for result in per_account}
+    return {"status": statuses.pop() if len(statuses) == 1 else "mixed", "accounts": per_account}
@@ -0,0 +1,27 @@
+import os
+
+# Pre-trade risk settings shared by live trading and the replay engine
+
+# Set minimum fund able to trade
+FREE_COLLATERAL_MIN = 10.0
+# Furthest a market order may fill from the best price (oracle price without a book), in basis points
+MAX_SLIPPAGE_BPS = float(os.environ.get("MAX_SLIPPAGE_BPS", 50))
+
+
+def has_free_collateral(free_collateral: float, minimum: float = FREE_COLLATERAL_MIN) -> bool:
+    return free_collateral > minimum
+
+
+# Furthest price MAX_SLIPPAGE_BPS allows from the reference price
+def slippage_bound(side: str, reference: float) -> float:
+    slippage = MAX_SLIPPAGE_BPS / 10000
+    return reference * (1 + slippage) if side == "buy" else reference * (1 - slippage)
+
+
+# Worst price a market order may fill at: the book level its size reaches,
+# capped at the slippage bound. A book too thin for the size gets the bound.
+def limit_price(side: str, reference: float, walked: float = None) -> float:
+    bound = slippage_bound(side, reference)
+    if walked is None:
+        return bound
+    return min(walked, bound) if side == "buy" else max(walked, bound)
@@ -0,0 +1,105 @@
+import asyncio
+import contextvars
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Most orders placed at once across all markets
+EXECUTION_CONCURRENCY = int(os.environ.get("EXECUTION_CONCURRENCY", 8))
+# Recent queue waits kept for the wait-time percentiles
+WAIT_SAMPLES = 256
+
+
+# Runs orders for the same market one at a time, in submission order, while
+# different markets run in parallel up to a global concurrency limit. Long
+# running work such as a sliced order holds its market without a global slot
+# and takes one per broadcast through slot().
+class MarketScheduler:
+
+    def __init__(self, concurrency=EXECUTION_CONCURRENCY):
+        self.concurrency = concurrency
+        self.slots = None
+        self.queues = {}
+        self.runners = {}
+        self.running = 0
+        self.completed = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.max_wait = 0.0
+
+    # Queue make_call() behind earlier work for market_pair and wait for its
+    # result. With hold_slot=False the call keeps its market but not a global slot.
+    async def submit(self, market_pair, make_call, hold_slot=True):
+        future = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(market_pair, deque()).append(
+            (make_call, future, time.monotonic(), contextvars.copy_context(), hold_slot)
+        )
+        if market_pair not in self.runners:
+            self.runners[market_pair] = asyncio.ensure_future(self._drain(market_pair))
+        return await future
+
+    async def _drain(self, market_pair):
+        queue = self.queues[market_pair]
+        try:
+            while queue:
+                make_call, future, enqueued_at, context, hold_slot = queue[0]
+                async with self.slot() if hold_slot else nullcontext():
+                    queue.popleft()
+                    wait = time.monotonic() - enqueued_at
+                    self.waits.append(wait)
+                    self.max_wait = max(self.max_wait, wait)
+                    self.running += 1
+                    try:
+                        # Run in the submitter's context, not the runner's
+                        result = await context.run(asyncio.ensure_future, make_call())
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                    except BaseException as e:
+                        # Cancellation or exit: settle the submitter before the runner stops
+                        if not future.done():
+                            if isinstance(e, asyncio.CancelledError):
+                                future.cancel()
+                            else:
+                                future.set_exception(e)
+                        raise
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+                    finally:
+                        self.running -= 1
+                        self.completed += 1
+        finally:
+            # Only reached with work left when the runner itself is cancelled
+            for _, future, _, _, _ in queue:
+                future.cancel()
+            del self.runners[market_pair]
+            del self.queues[market_pair]
+
+    # One of the global slots, as an async context manager
+    def slot(self) -> asyncio.Semaphore:
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.concurrency)
+        return self.slots
+
+    def depth(self, market_pair=None) -> int:
+        if market_pair is not None:
+            return len(self.queues.get(market_pair, ()))
+        return sum(len(queue) for queue in self.queues.values())
+
+    def stats(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "queued": self.depth(),
+            "running": self.running,
+            "completed": self.completed,
+            "markets": {market_pair: len(queue) for market_pair, queue in self.queues.items()},
+            "wait_ms": {
+                "p50": round(waits[len(waits) // 2] * 1000, 3) if waits else 0.0,
+                "p95": round(waits[int(len(waits) * 0.95)] * 1000, 3) if waits else 0.0,
+                "max": round(self.max_wait * 1000, 3)
+            }
+        }
+
+
+scheduler = MarketScheduler()
@@ -1,10 +1,144 @@
+import os
+import threading
+import time
+from collections import deque
+
 import requests
 
-# Send Message
-def send_message(webhook_id, webhook_token, message):
-    url = f"https://discord.com/api/webhooks/{webhook_id}/{webhook_token}"
-    res = requests.post(url, json=message)
-    if res.status_code == 204:
-        return "sent"
-    else:
-        return "failed"
\ No newline at end of file
+import metrics
+
+# Override to point notifications at a local stand-in
+DISCORD_API_URL = os.environ.get("DISCORD_API_URL", "https://discord.com/api")
+# Time to wait for more signals before sending a coalesced message
+COALESCE_SECONDS = 0.05
+# Discord accepts at most 10 embeds per message
+MAX_EMBEDS = 10
+MAX_RETRIES = 3
+REQUEST_TIMEOUT = 5
+
+# Pooled connection reused by every message sent from this container
+session = requests.Session()
+
+def webhook_url(webhook_id, webhook_token, base_url=DISCORD_API_URL):
+    return f"{base_url}/webhooks/{webhook_id}/{webhook_token}"
+
+# Seconds to wait before retrying a rate limited request
+def retry_after(res):
+    try:
+        return float(res.json()["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return float(res.headers.get("Retry-After", 1))
+
+# Merge queued messages into one message with all of their embeds
+def coalesce(messages):
+    merged = {key: value for key, value in messages[0].items() if key != "embeds"}
+    merged["embeds"] = []
+    for message in messages:
+        embeds = message.get("embeds") or [{"description": message.get("content", "")}]
+        merged["embeds"].extend(embeds)
+    return merged
+
+def embed_count(message):
+    return len(message.get("embeds") or [None])
+
+
+# Sends Discord notifications from a background thread so they stay off the order path
+class DiscordNotifier:
+
+    def __init__(self, webhook_id, webhook_token, base_url=DISCORD_API_URL, coalesce_seconds=COALESCE_SECONDS):
+        self.url = webhook_url(webhook_id, webhook_token, base_url)
+        self.coalesce_seconds = coalesce_seconds
+        self.queue = deque()
+        self.pending = 0
+        self.condition = threading.Condition()
+        self.worker = None
+        self.blocked_until = 0.0
+        self.sent = 0
+        self.failed = 0
+
+    def notify(self, message):
+        with self.condition:
+            self.queue.append(message)
+            self.pending += 1
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self._run, daemon=True)
+                self.worker.start()
+            self.condition.notify_all()
+
+    # Wait for queued messages to go out; returns False if some are still pending
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def _next_batch(self):
+        with self.condition:
+            while not self.queue:
+                self.condition.wait()
+        # Give a burst of signals a moment to arrive and share one message
+        time.sleep(self.coalesce_seconds)
+        with self.condition:
+            batch = [self.queue.popleft()]
+            embeds = embed_count(batch[0])
+            while self.queue and embeds + embed_count(self.queue[0]) <= MAX_EMBEDS:
+                embeds += embed_count(self.queue[0])
+                batch.append(self.queue.popleft())
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.post(batch[0] if len(batch) == 1 else coalesce(batch))
+            finally:
+                with self.condition:
+                    self.pending -= len(batch)
+                    self.condition.notify_all()
+
+    def _wait_for_bucket(self):
+        delay = self.blocked_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    # Honour the bucket headers so the next request isn't rejected
+    def _track_bucket(self, res):
+        if res.headers.get("X-RateLimit-Remaining") == "0":
+            reset_after = float(res.headers.get("X-RateLimit-Reset-After", 1))
+            self.blocked_until = time.monotonic() + reset_after
+
+    def post(self, message):
+        started = time.perf_counter()
+        outcome = self._post(message)
+        metrics.emit(
+            "discord_send", {"discord_send": (time.perf_counter() - started) * 1000},
+            {"outcome": outcome, "embeds": embed_count(message)}
+        )
+        return outcome
+
+    def _post(self, message):
+        for attempt in range(MAX_RETRIES + 1):
+            self._wait_for_bucket()
+            try:
+                res = session.post(self.url, json=message, timeout=REQUEST_TIMEOUT)
+            except requests.RequestException as e:
+                print(f"Failed to send message: {e}")
+                time.sleep(2 ** attempt * 0.25)
+                continue
+            self._track_bucket(res)
+            if res.status_code == 429:
+                self.blocked_until = time.monotonic() + retry_after(res)
+            elif res.status_code >= 500:
+                time.sleep(2 ** attempt * 0.25)
+            elif res.status_code == 204:
+                self.sent += 1
+                return "sent"
+            else:
+                break
+        self.failed += 1
+        print(f"Failed to send message: {message}")
+        return "failed"
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import os
+import re
+
+import boto3
+
+from connection import connections
+
+logger = logging.getLogger(__name__)
+
+# Where the last handed out sequence is persisted: "file:<path>", "dynamodb:<table>" or "none"
+SEQUENCE_STORE = os.environ.get("SEQUENCE_STORE", "file:/tmp/dydx_sequences.json")
+# Optional endpoint for DynamoDB-compatible stores (e.g. DynamoDB Local)
+SEQUENCE_STORE_ENDPOINT = os.environ.get("SEQUENCE_STORE_ENDPOINT")
+# Cosmos SDK ErrWrongSequence
+SEQUENCE_MISMATCH_CODE = 32
+SEQUENCE_MISMATCH_PATTERN = re.compile(r"account sequence mismatch, expected (\d+)")
+
+
+# Keep account number and sequence per address in a local JSON file
+class FileSequenceStore:
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def load(self, address):
+        return self._read().get(address)
+
+    def save(self, address, record):
+        records = self._read()
+        records[address] = record
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(records, f)
+        os.replace(tmp_path, self.path)
+
+
+# Keep account number and sequence per address in a DynamoDB table keyed on "address"
+class DynamoDBSequenceStore:
+
+    def __init__(self, table_name, region=None, endpoint_url=None):
+        self.table_name = table_name
+        session = boto3.session.Session()
+        self.client = session.client(
+            service_name="dynamodb",
+            region_name=region,
+            endpoint_url=endpoint_url
+        )
+
+    def load(self, address):
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={"address": {"S": address}},
+            ConsistentRead=True
+        )
+        item = response.get("Item")
+        if item is None:
+            return None
+        return {
+            "account_number": int(item["account_number"]["N"]),
+            "sequence": int(item["sequence"]["N"])
+        }
+
+    def save(self, address, record):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                "address": {"S": address},
+                "account_number": {"N": str(record["account_number"])},
+                "sequence": {"N": str(record["sequence"])}
+            }
+        )
+
+
+def make_sequence_store(spec=SEQUENCE_STORE, region=None):
+    kind, _, target = spec.partition(":")
+    if kind == "file":
+        return FileSequenceStore(target)
+    if kind == "dynamodb":
+        return DynamoDBSequenceStore(target, region, SEQUENCE_STORE_ENDPOINT)
+    return None
+
+
+# Owns one account's sequence locally and hands it out to concurrent orders
+class SequenceManager:
+
+    def __init__(self, connections, address, store=None):
+        self.connections = connections
+        self.address = address
+        self.store = store
+        self.account_number = None
+        self.sequence = None
+        self.load_task = None
+        self.persist_task = None
+        self.dirty = False
+        self.resyncs = 0
+        # Set when the chain rejected our sequence without naming the expected
+        # one; the stored record is then just as stale and must not be trusted
+        self.stale = False
+
+    async def _load(self):
+        record = None
+        if self.store is not None and not self.stale:
+            try:
+                record = await asyncio.to_thread(self.store.load, self.address)
+            except Exception as e:
+                logger.warning(f"Failed to load sequence for {self.address}: {e}")
+        if record is None:
+            await self.sync()
+        else:
+            self.account_number = record["account_number"]
+            self.sequence = record["sequence"]
+
+    # Wait until a sequence is known; concurrent callers share a single load
+    async def ready(self):
+        if self.sequence is not None:
+            return
+        if self.load_task is None:
+            self.load_task = asyncio.ensure_future(self._load())
+        task = self.load_task
+        try:
+            await task
+        finally:
+            if self.load_task is task:
+                self.load_task = None
+
+    async def sync(self):
+        account = await self.connections.call_node(lambda node: node.get_account(self.address), hedge=True)
+        self.account_number = account.account_number
+        self.sequence = account.sequence
+        self.stale = False
+        self.resyncs += 1
+        self.persist()
+
+    # The next sequence, waiting for a load or resync in progress, e.g. after
+    # a mismatch another order hit; take() runs right after ready() with no
+    # await in between, so it is still atomic within the event loop
+    async def next(self) -> int:
+        await self.ready()
+        return self.take()
+
+    # Hand out the next sequence; no await, so this is atomic within the event loop
+    def take(self) -> int:
+        sequence = self.sequence
+        self.sequence += 1
+        self.persist()
+        return sequence
+
+    # Returns True when the broadcast failed on a sequence mismatch
+    def check_mismatch(self, transaction) -> bool:
+        tx_response = getattr(transaction, "tx_response", None)
+        if tx_response is None or not tx_response.code:
+            return False
+        match = SEQUENCE_MISMATCH_PATTERN.search(tx_response.raw_log)
+        if tx_response.code != SEQUENCE_MISMATCH_CODE and match is None:
+            return False
+        logger.warning(f"Sequence mismatch for {self.address}: {tx_response.raw_log}")
+        if match is not None:
+            self.sequence = int(match.group(1))
+            self.persist()
+        else:
+            # Force a chain read on the next ready(), bypassing the store,
+            # whose record holds the sequence just rejected
+            self.sequence = None
+            self.stale = True
+        return True
+
+    def persist(self):
+        if self.store is None:
+            return
+        self.dirty = True
+        if self.persist_task is None:
+            self.persist_task = asyncio.ensure_future(self._persist())
+
+    async def _persist(self):
+        try:
+            # Always write the latest value; saves issued while writing are folded in
+            while self.dirty:
+                self.dirty = False
+                record = {"account_number": self.account_number, "sequence": self.sequence}
+                if record["sequence"] is None:
+                    break
+                await asyncio.to_thread(self.store.save, self.address, record)
+        except Exception as e:
+            logger.warning(f"Failed to persist sequence for {self.address}: {e}")
+        finally:
+            self.persist_task = None
+
+    async def flush(self):
+        if self.persist_task is not None:
+            await self.persist_task
+
+
+sequence_managers = {}
+
+
+# One sequence manager per address
+def get_sequence_manager(address, region=None) -> SequenceManager:
+    manager = sequence_managers.get(address)
+    if manager is None:
+        manager = SequenceManager(connections, address, make_sequence_store(region=region))
+        sequence_managers[address] = manager
+    return manager
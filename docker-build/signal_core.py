@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import time
+
+from dedup import SignalDeduplicator, make_dedup_store, signal_fingerprint
+from send_message import DiscordNotifier
+
+logger = logging.getLogger(__name__)
+
+# The trading Lambda's timeout, API Gateway's 29 second integration limit
+HANDLER_TIMEOUT_SECONDS = float(os.environ.get("HANDLER_TIMEOUT_SECONDS", 29))
+# Longest the handler waits for queued notifications and dedup writes before returning
+NOTIFY_FLUSH_SECONDS = 3.0
+# Most signals accepted in one batch request
+MAX_BATCH_SIGNALS = 20
+# Echoed back when a request carries no usable signal
+EMPTY_SIGNAL = {
+    "order_strategy": "",
+    "signal_time": "",
+    "signal_price": "",
+    "market_pair": "",
+    "order_side": "",
+    "order_size": ""
+}
+
+
+def build_message(res_data):
+    return {
+        "username": "TradingView Webhook",
+        "content": "Trading signal receiving from webhook",
+        "embeds": [
+            {
+                "fields": [
+                    {
+                        "name": "Strategy",
+                        "value": res_data["order_strategy"],
+                        "inline": True
+                    },
+                    {
+                        "name": "Time",
+                        "value": res_data["signal_time"],
+                        "inline": True
+                    },
+                    {
+                        "name": "Market",
+                        "value": res_data["market_pair"]
+                    },
+                    {
+                        "name": "Price",
+                        "value": res_data["signal_price"]
+                    },
+                    {
+                        "name": "Order Side",
+                        "value": res_data["order_side"].upper()
+                    },
+                    {
+                        "name": "Order Size",
+                        "value": res_data["order_size"]
+                    }
+                ]
+            }
+        ]
+    }
+
+
+# Normalise one TradingView signal; raises KeyError, TypeError or ValueError when malformed
+def parse_signal(data):
+    market_pair = data['market_pair']
+    market_pair = market_pair.replace("USD.P", "")
+    market_pair = market_pair + "-USD"
+    return {
+        "order_strategy": data['order_strategy'],
+        "signal_time": data['signal_time'],
+        "signal_price": data['signal_price'],
+        "market_pair": market_pair,
+        "order_side": data['order_side'],
+        "order_size": float(data['order_size'])
+    }
+
+
+def signal_data(signal):
+    return dict(signal, order_size=str(signal["order_size"]))
+
+
+def validate_signal(data):
+    try:
+        signal = parse_signal(data)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return None, f"Invalid signal: {e!r}"
+    if signal["order_side"] not in ("buy", "sell"):
+        return signal, "order_side must be buy or sell"
+    if not signal["order_size"] > 0:
+        return signal, "order_size must be positive"
+    return signal, None
+
+
+# Notifier and deduplicator for the account's message config
+def make_core(trading, message_config, region_name):
+    notifier = DiscordNotifier(message_config["message_webhook_id"], message_config["message_webhook_token"])
+    # Redelivered alerts get the original result instead of a second order
+    deduplicator = SignalDeduplicator(make_dedup_store(region=region_name))
+    return SignalCore(trading, notifier, deduplicator)
+
+
+# Signal handling shared by the Lambda handler and the daemon: deduplicate,
+# notify and place orders. Every entry point returns (status code, body).
+class SignalCore:
+
+    def __init__(self, trading, notifier, deduplicator):
+        # Returns the configured orders module, loading it on first use
+        self.trading = trading
+        self.notifier = notifier
+        self.deduplicator = deduplicator
+
+    # Answer a signal that was already handled, or is still being handled elsewhere
+    def duplicate_response(self, record):
+        if record["result"] is None:
+            return 409, {"error": "Signal is already being processed"}
+        return 200, record["result"]
+
+    # One parsed signal, or None when the request carried none. received_at is
+    # the perf_counter() time the request arrived, defaulting to now.
+    async def handle_signal(self, signal, received_at=None):
+        received_at = received_at or time.perf_counter()
+        res_data = EMPTY_SIGNAL if signal is None else signal_data(signal)
+        fingerprint = None
+        if signal is not None and signal["order_side"] in ("sell", "buy"):
+            fingerprint = signal_fingerprint(signal)
+            previous = await self.deduplicator.claim(fingerprint)
+            if previous is not None:
+                return self.duplicate_response(previous)
+        # Queue the notification so it goes out while the order is placed
+        self.notifier.notify(build_message(res_data))
+        if fingerprint is not None:
+            try:
+                orders = self.trading()
+                results = await orders.execute_signal(
+                    signal["market_pair"], signal["order_side"], signal["order_size"], received_at,
+                    signal["order_strategy"]
+                )
+                # Fail the request only when no account placed its order
+                errors = [outcome for _, outcome in results if isinstance(outcome, BaseException)]
+                if errors and len(errors) == len(results):
+                    raise errors[0]
+            except BaseException:
+                await self.deduplicator.release(fingerprint)
+                raise
+            if len(results) != 1:
+                res_data = dict(res_data, **orders.signal_result(results))
+            self.deduplicator.complete(fingerprint, res_data)
+        return 200, res_data
+
+    # Validate a whole array of signals, then place the valid ones (markets and accounts in parallel, each
+    # account's market in order)
+    async def handle_batch(self, signals, received_at=None):
+        received_at = received_at or time.perf_counter()
+        if not signals or len(signals) > MAX_BATCH_SIGNALS:
+            return 400, {"error": f"Batch must contain 1 to {MAX_BATCH_SIGNALS} signals"}
+        results = []
+        claimed = []
+        for data in signals:
+            signal, error = validate_signal(data)
+            result = signal_data(signal) if signal is not None else {}
+            if error is not None:
+                result.update(status="invalid", error=error)
+            else:
+                claimed.append((len(results), signal, result, signal_fingerprint(signal)))
+            results.append(result)
+        # Claim the whole batch at once; a repeat within the batch is a duplicate of its first copy
+        first = {}
+        for entry in claimed:
+            first.setdefault(entry[3], entry[0])
+        records = await asyncio.gather(*(self.deduplicator.claim(fingerprint) for fingerprint in first))
+        previous = dict(zip(first, records))
+        valid = []
+        for i, signal, result, fingerprint in claimed:
+            record = previous[fingerprint]
+            if first[fingerprint] != i or (record is not None and record["result"] is None):
+                result.update(status="duplicate", error="Signal is already being processed")
+            elif record is not None:
+                results[i] = record["result"]
+            else:
+                valid.append((signal, result, fingerprint))
+                self.notifier.notify(build_message(result))
+        if valid:
+            orders = self.trading()
+            try:
+                outcomes = await orders.place_market_orders([signal for signal, _, _ in valid], received_at)
+            except BaseException:
+                await asyncio.gather(*(self.deduplicator.release(fingerprint) for _, _, fingerprint in valid))
+                raise
+            released = []
+            for (_, result, fingerprint), outcome in zip(valid, outcomes):
+                result.update(orders.signal_result(outcome))
+                # Failed orders may be retried by a redelivery
+                if result["status"] == "error":
+                    released.append(self.deduplicator.release(fingerprint))
+                else:
+                    self.deduplicator.complete(fingerprint, result)
+            await asyncio.gather(*released)
+        return 200, {"results": results}
+
+    # A decoded request body: an array is a batch, an object a single signal
+    async def handle(self, body, received_at=None):
+        if isinstance(body, list):
+            return await self.handle_batch(body, received_at)
+        signal, error = validate_signal(body)
+        if error is not None:
+            return 400, {"error": error}
+        return await self.handle_signal(signal, received_at)
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+
+from signal_core import HANDLER_TIMEOUT_SECONDS, NOTIFY_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Slicing policy per order_strategy as JSON, "*" for every other strategy, e.g.
+# {"breakout": {"algo": "twap", "slices": 5, "blocks": 10},
+#  "swing": {"algo": "block_cap", "max_size": 0.5},
+#  "*": {"algo": "none"}}
+SLICING_POLICIES = os.environ.get("SLICING_POLICIES", "{}")
+# Time kept at the end of the deadline for the last children's fills to arrive
+SETTLE_SECONDS = 3.0
+# Time kept after the deadline to cancel children still open and respond
+CANCEL_SECONDS = 2.0
+# A sliced order must be done this long after its signal arrived, leaving the
+# handler its flush budget before the trading Lambda times out
+SLICING_DEADLINE_SECONDS = float(os.environ.get(
+    "SLICING_DEADLINE_SECONDS", HANDLER_TIMEOUT_SECONDS - NOTIFY_FLUSH_SECONDS - CANCEL_SECONDS
+))
+ALGOS = ("none", "twap", "block_cap")
+
+
+# How one strategy's orders are split into child orders:
+#  twap: `slices` equal children spread evenly over `blocks` blocks
+#  block_cap: children of at most `max_size`, one per block
+# Orders no larger than min_size are placed whole.
+class SlicingPolicy:
+
+    def __init__(self, algo="none", slices=4, blocks=8, max_size=None, min_size=0.0):
+        if algo not in ALGOS:
+            raise ValueError(f"Unknown slicing algo {algo!r}, expected one of {ALGOS}")
+        if algo == "block_cap" and not max_size:
+            raise ValueError("block_cap slicing needs a positive max_size")
+        self.algo = algo
+        self.slices = max(1, int(slices))
+        self.blocks = max(1, int(blocks))
+        self.max_size = float(max_size) if max_size else None
+        self.min_size = float(min_size)
+
+    def applies(self, order_size: float) -> bool:
+        if self.algo == "none" or order_size <= self.min_size:
+            return False
+        if self.algo == "block_cap":
+            return order_size > self.max_size
+        return self.slices > 1
+
+    # (seconds after the first child, child size) for every child. Children
+    # are multiples of step: twap spreads the order as evenly as the step
+    # allows, block_cap fills children of max_size with the remainder last.
+    # When the plan would not fit in budget seconds it is compressed: fewer
+    # blocks for twap, even children larger than max_size for block_cap.
+    def plan(self, order_size: float, step: float, block_interval: float, budget: float):
+        max_blocks = max(1, math.floor(budget / block_interval))
+        units = max(1, round(order_size / step))
+        if self.algo == "twap":
+            child_units = even_split(units, min(self.slices, units))
+            spacing = min(self.blocks, max_blocks) / len(child_units)
+        else:
+            cap_units = max(1, math.floor(self.max_size / step + 1e-9))
+            full, rest = divmod(units, cap_units)
+            child_units = [cap_units] * full + ([rest] if rest else [])
+            if len(child_units) > max_blocks:
+                logger.warning(f"Slicing {order_size} into {max_blocks} children above max_size {self.max_size} to finish in time")
+                child_units = even_split(units, max_blocks)
+            spacing = 1
+        sizes = [round(count * step, 12) for count in child_units]
+        # Absorb an order size that is not a whole number of steps
+        sizes[-1] = round(order_size - sum(sizes[:-1]), 12)
+        return [(i * spacing * block_interval, size) for i, size in enumerate(sizes)]
+
+
+# units split into count parts differing by at most one, larger parts first
+def even_split(units: int, count: int) -> list:
+    base, extra = divmod(units, count)
+    return [base + 1] * extra + [base] * (count - extra)
+
+def load_policies(spec=SLICING_POLICIES) -> dict:
+    return {strategy: SlicingPolicy(**policy) for strategy, policy in json.loads(spec or "{}").items()}
+
+
+policies = load_policies()
+
+
+def policy_for(order_strategy) -> SlicingPolicy:
+    return policies.get(order_strategy) or policies.get("*") or SlicingPolicy()
+
+
+# One child order and what is known about its fill
+class Child:
+    __slots__ = ("client_id", "size", "outcome", "filled", "settled")
+
+    def __init__(self, client_id, size):
+        self.client_id = client_id
+        self.size = size
+        self.outcome = None
+        self.filled = 0.0
+        self.settled = False
+
+    # Size counted against the parent: the fill once settled, all of it while in flight
+    def committed(self) -> float:
+        return self.filled if self.settled else self.size
+
+
+# Execute a parent order as a schedule of child market orders. Each child is
+# broadcast at its block without waiting on the ones before it; fills come
+# from the subaccount stream's order updates. Children that fill short are
+# made up by the next child, the rest of the plan is dropped once the parent
+# is filled, and children still open at the deadline are cancelled.
+#   place(size, client_id) -> transaction, or None when risk checks refuse it
+#   cancel(client_id) -> transaction
+class SlicedOrder:
+
+    def __init__(self, policy, order_size, step, block_interval, subaccount, place, cancel, new_client_id,
+                 deadline):
+        self.policy = policy
+        self.order_size = order_size
+        self.step = step
+        self.block_interval = block_interval
+        self.subaccount = subaccount
+        self.place = place
+        self.cancel = cancel
+        self.new_client_id = new_client_id
+        # perf_counter() time by which the parent is done
+        self.deadline = deadline
+        self.children = []
+        self.refused = False
+        self.cancelled = 0
+
+    # Including what children cancelled at the deadline had filled so far
+    def filled(self) -> float:
+        return sum(child.filled for child in self.children)
+
+    def committed(self) -> float:
+        return sum(child.committed() for child in self.children)
+
+    # Fold the stream's order updates into the children. Without a live stream
+    # an accepted child is taken as filled, as market orders fill or expire at once.
+    def observe(self):
+        live = self.subaccount.is_live()
+        for child in self.children:
+            if child.settled or child.outcome is None:
+                continue
+            status = self.subaccount.order_status(child.client_id)
+            if status is not None:
+                child.filled = min(status[1], child.size)
+                child.settled = status[0] in ("FILLED", "CANCELED", "BEST_EFFORT_CANCELED")
+            elif not live:
+                accepted = not isinstance(child.outcome, BaseException) and not child.outcome.tx_response.code
+                child.filled = child.size if accepted else 0.0
+                child.settled = True
+
+    async def _place_child(self, child):
+        try:
+            child.outcome = await self.place(child.size, child.client_id)
+        except Exception as e:
+            child.outcome = e
+            logger.warning(f"Child order {child.client_id} failed: {e}")
+        if child.outcome is None:
+            # Refused by the risk checks; nothing more is sent
+            self.refused = True
+            child.settled = True
+        elif isinstance(child.outcome, BaseException) or child.outcome.tx_response.code:
+            child.settled = True
+        self.observe()
+
+    async def run(self):
+        started = time.perf_counter()
+        plan = self.policy.plan(
+            self.order_size, self.step, self.block_interval, self.deadline - started - SETTLE_SECONDS
+        )
+        tasks = []
+        try:
+            for i, (offset, size) in enumerate(plan):
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.observe()
+                remaining = self.order_size - self.committed()
+                if self.refused or remaining < self.step / 2 or time.perf_counter() > self.deadline - SETTLE_SECONDS:
+                    break
+                # The last child takes whatever earlier children left unfilled
+                child_size = round(remaining, 12) if i == len(plan) - 1 else min(size, remaining)
+                child = Child(self.new_client_id(), child_size)
+                self.subaccount.watch(child.client_id)
+                self.children.append(child)
+                tasks.append(asyncio.ensure_future(self._place_child(child)))
+            await asyncio.gather(*tasks)
+            # Wait for the stream to report the last fills
+            while any(not child.settled for child in self.children) and time.perf_counter() < self.deadline:
+                await asyncio.sleep(min(self.block_interval, max(0.0, self.deadline - time.perf_counter())))
+                self.observe()
+            for child in self.children:
+                if not child.settled:
+                    await self._cancel_child(child)
+        finally:
+            for task in tasks:
+                task.cancel()
+            for child in self.children:
+                self.subaccount.unwatch(child.client_id)
+        return self
+
+    async def _cancel_child(self, child):
+        try:
+            await self.cancel(child.client_id)
+            self.cancelled += 1
+        except Exception as e:
+            logger.warning(f"Cancelling child order {child.client_id} failed: {e}")
+
+    # Summary for the webhook response
+    def result(self) -> dict:
+        transactions = [
+            child.outcome for child in self.children
+            if child.outcome is not None and not isinstance(child.outcome, BaseException)
+        ]
+        filled = round(self.filled(), 12)
+        if filled >= self.order_size - self.step / 2:
+            status = "placed"
+        elif filled > 0:
+            status = "partial"
+        elif self.refused and not transactions:
+            status = "skipped"
+        else:
+            status = "rejected"
+        result = {
+            "status": status,
+            "algo": self.policy.algo,
+            "filled": filled,
+            "children": len(self.children),
+            "cancelled": self.cancelled,
+            "tx_hashes": [transaction.tx_response.txhash for transaction in transactions]
+        }
+        if result["tx_hashes"]:
+            result["tx_hash"] = result["tx_hashes"][0]
+        return result
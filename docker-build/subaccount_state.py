@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from connection import connections
+from indexer_stream import IndexerStream
+from market_cache import market_cache
+from utils import subaccount_info
+
+logger = logging.getLogger(__name__)
+
+# Stream subaccount updates from the indexer websocket; REST only is used when off
+SUBACCOUNT_WEBSOCKET = os.environ.get("SUBACCOUNT_WEBSOCKET", "1") == "1"
+# Without a live stream, a REST snapshot is trusted for this long; with one it
+# is refreshed in the background once this old
+SUBACCOUNT_MAX_AGE = float(os.environ.get("SUBACCOUNT_MAX_AGE", 60))
+# Even with a live stream a snapshot is not trusted past this age, as the
+# stream's updates only approximate collateral (no unrealised PnL drift)
+SUBACCOUNT_LIVE_MAX_AGE = float(os.environ.get("SUBACCOUNT_LIVE_MAX_AGE", 300))
+# Collateral reserved for an in-flight order is released after this long
+# even if no final order update arrives (short-term orders expire in blocks)
+RESERVATION_TTL = 30
+# Used for markets whose initial margin fraction is not cached yet
+DEFAULT_INITIAL_MARGIN_FRACTION = 0.05
+FINAL_ORDER_STATUSES = ("FILLED", "CANCELED", "BEST_EFFORT_CANCELED")
+
+
+def initial_margin_fraction(market_pair):
+    market = market_cache.markets.get(market_pair)
+    if market is None:
+        return DEFAULT_INITIAL_MARGIN_FRACTION
+    return float(market.market.get("initialMarginFraction", DEFAULT_INITIAL_MARGIN_FRACTION))
+
+
+# Free collateral, equity and positions of one subaccount, kept in memory
+class SubaccountState:
+
+    def __init__(self, connections, address, subaccount_number=0,
+                 websocket_url=None, use_websocket=SUBACCOUNT_WEBSOCKET):
+        self.connections = connections
+        self.address = address
+        self.subaccount_number = subaccount_number
+        self.websocket_url = websocket_url
+        self.use_websocket = use_websocket
+        self.lock = threading.Lock()
+        self.free_collateral = None
+        self.equity = None
+        self.positions = {}
+        self.assets = {}
+        self.seeded_at = 0.0
+        self.needs_refresh = False
+        self.reservations = {}
+        # Latest (status, total filled) of orders being watched, by client id
+        self.watched = {}
+        self.stream = IndexerStream("Subaccount", self.on_open, self.on_message)
+        self.refresh_task = None
+        self.seed_task = None
+        self.rest_seeds = 0
+        self.stream_updates = 0
+
+    def apply_snapshot(self, subaccount):
+        with self.lock:
+            self.free_collateral = float(subaccount["freeCollateral"])
+            self.equity = float(subaccount["equity"])
+            self.positions = dict(subaccount.get("openPerpetualPositions") or {})
+            self.assets = dict(subaccount.get("assetPositions") or {})
+            self.seeded_at = time.monotonic()
+            self.needs_refresh = False
+
+    # Fold one v4_subaccounts channel_data message into the state
+    def apply_update(self, contents):
+        with self.lock:
+            for position in contents.get("perpetualPositions") or []:
+                if position.get("status") == "CLOSED" or float(position.get("size", 0)) == 0:
+                    self.positions.pop(position["market"], None)
+                else:
+                    self.positions[position["market"]] = position
+            for asset in contents.get("assetPositions") or []:
+                self.assets[asset["symbol"]] = asset
+            # Position, balance and transfer updates change collateral in ways
+            # only a snapshot reports, e.g. a deposit
+            if contents.get("perpetualPositions") or contents.get("assetPositions") or contents.get("transfers"):
+                self.needs_refresh = True
+            for order in contents.get("orders") or []:
+                client_id = str(order.get("clientId"))
+                if client_id in self.watched:
+                    self.watched[client_id] = (order.get("status"), float(order.get("totalFilled") or 0))
+                if order.get("status") in FINAL_ORDER_STATUSES:
+                    self.reservations.pop(str(order.get("clientId")), None)
+            for fill in contents.get("fills") or []:
+                # Assume every fill opens exposure: take its fee and initial
+                # margin off free collateral until the next REST snapshot
+                notional = float(fill["size"]) * float(fill["price"])
+                margin = notional * initial_margin_fraction(fill["market"])
+                if self.free_collateral is not None:
+                    self.free_collateral -= margin + float(fill.get("fee", 0))
+                self.needs_refresh = True
+            self.stream_updates += 1
+
+    def on_open(self, ws):
+        ws.subaccounts.subscribe(self.address, self.subaccount_number)
+
+    def on_message(self, ws, message):
+        try:
+            if message.get("type") == "subscribed":
+                self.apply_snapshot(message["contents"]["subaccount"])
+            elif message.get("type") == "channel_data":
+                self.apply_update(message["contents"])
+            elif message.get("type") == "channel_batch_data":
+                for contents in message["contents"]:
+                    self.apply_update(contents)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring malformed subaccount update: {e}")
+
+    def start_stream(self):
+        if self.use_websocket:
+            # Defaults to the configured endpoints' websocket
+            self.stream.start(self.websocket_url or self.connections.websocket_url)
+
+    def is_live(self) -> bool:
+        return self.stream.is_live()
+
+    def snapshot_age(self) -> float:
+        return time.monotonic() - self.seeded_at
+
+    def is_fresh(self) -> bool:
+        if self.free_collateral is None:
+            return False
+        return self.snapshot_age() < (SUBACCOUNT_LIVE_MAX_AGE if self.is_live() else SUBACCOUNT_MAX_AGE)
+
+    async def seed(self):
+        self.apply_snapshot(await subaccount_info(self.address, self.subaccount_number))
+        self.rest_seeds += 1
+
+    # Concurrent callers share one REST request
+    async def _seed_once(self):
+        if self.seed_task is None:
+            self.seed_task = asyncio.ensure_future(self.seed())
+        task = self.seed_task
+        try:
+            await task
+        finally:
+            if self.seed_task is task:
+                self.seed_task = None
+
+    async def _background_refresh(self):
+        try:
+            await self.seed()
+        except Exception as e:
+            logger.warning(f"Subaccount refresh failed: {e}")
+        finally:
+            self.refresh_task = None
+
+    # In-memory state, falling back to a REST snapshot only when stale
+    async def get(self):
+        self.start_stream()
+        if not self.is_fresh():
+            await self._seed_once()
+        elif (self.needs_refresh or self.snapshot_age() >= SUBACCOUNT_MAX_AGE) and self.refresh_task is None:
+            self.refresh_task = asyncio.ensure_future(self._background_refresh())
+        return self
+
+    # Free collateral not yet promised to in-flight orders
+    def available(self) -> float:
+        now = time.monotonic()
+        with self.lock:
+            self.reservations = {
+                client_id: (amount, expires)
+                for client_id, (amount, expires) in self.reservations.items()
+                if expires > now
+            }
+            return self.free_collateral - sum(amount for amount, _ in self.reservations.values())
+
+    def reserve(self, client_id, amount):
+        with self.lock:
+            self.reservations[str(client_id)] = (amount, time.monotonic() + RESERVATION_TTL)
+
+    def release(self, client_id):
+        with self.lock:
+            self.reservations.pop(str(client_id), None)
+
+    # Record stream updates of an order until unwatched
+    def watch(self, client_id):
+        with self.lock:
+            self.watched.setdefault(str(client_id), None)
+
+    def unwatch(self, client_id):
+        with self.lock:
+            self.watched.pop(str(client_id), None)
+
+    # (status, total filled) from the stream, or None before its first update
+    def order_status(self, client_id):
+        with self.lock:
+            return self.watched.get(str(client_id))
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "freeCollateral": self.free_collateral,
+                "equity": self.equity,
+                "openPerpetualPositions": dict(self.positions),
+                "reserved": sum(amount for amount, _ in self.reservations.values())
+            }
+
+
+subaccount_states = {}
+
+
+# One state per subaccount
+def get_subaccount_state(address, subaccount_number=0) -> SubaccountState:
+    key = (address, subaccount_number)
+    state = subaccount_states.get(key)
+    if state is None:
+        state = SubaccountState(connections, address, subaccount_number)
+        subaccount_states[key] = state
+    return state
@@ -1,25 +1,24 @@
 import json
 import boto3
 from botocore.exceptions import ClientError
-from dydx_v4_client.indexer.rest.indexer_client import IndexerClient
-from dydx_v4_client.network import TESTNET
 
 async def subaccount_info(test_address, subaccount_no):
-    indexer = IndexerClient(TESTNET.rest_indexer)
-    try:
-        response = await indexer.account.get_subaccount(test_address, subaccount_no)
-        subaccount = response["subaccount"]
-    except Exception as e:
-        print(f"Error: {e}")
-    return subaccount
-
-async def get_secret(secret_name, region):
-    # Create a Secrets Manager client
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region
+    # Imported here so loading the AWS helpers doesn't pull in the dYdX client
+    from connection import connections
+    # Errors propagate so the endpoint pool and callers can classify them
+    response = await connections.call_indexer(
+        lambda indexer: indexer.account.get_subaccount(test_address, subaccount_no)
     )
+    return response["subaccount"]
+
+async def get_secret(secret_name, region, client=None):
+    # Create a Secrets Manager client unless a shared one is passed in
+    if client is None:
+        session = boto3.session.Session()
+        client = session.client(
+            service_name='secretsmanager',
+            region_name=region
+        )
     try:
         get_secret_value_response = client.get_secret_value(
             SecretId=secret_name
@@ -29,13 +28,14 @@ async def get_secret(secret_name, region):
     secret = json.loads(get_secret_value_response['SecretString'])
     return secret
 
-async def get_ssm_parameter(ssm_name, region):
-    # Create a SSM client
-    session = boto3.session.Session()
-    client = session.client(
-        service_name="ssm",
-        region_name=region
-    )
+async def get_ssm_parameter(ssm_name, region, client=None):
+    # Create a SSM client unless a shared one is passed in
+    if client is None:
+        session = boto3.session.Session()
+        client = session.client(
+            service_name="ssm",
+            region_name=region
+        )
     try:
         get_ssm_params_response = client.get_parameter(Name=ssm_name)
     except ClientError as e: